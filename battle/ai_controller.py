@@ -1,36 +1,113 @@
-import random
-import json, os
 from battle.buff import Target, Effect
+from battle.rng import unit_rng
+from battle.roster import TeamRoster, KEYS
+from battle.profile_library import ProfileLibrary
+from battle.battle_log import log, WARNING
 from enum import Enum, auto
+import asyncio
+import copy
 
-# 定義目標篩選策略的映射
+_SELF_GUARD = frozenset((Effect.ADDSHIELD, Effect.INVINCIBLE, Effect.ADDPDEF))  # 低血量時加分的保命效果
+
+
+def _has_effect(ch, eff_enum) -> bool:
+    for b in getattr(ch, "buffs", []):
+        if getattr(b, "effect", None) == eff_enum and getattr(b, "duration", 0) != 0:
+            return True
+    return False
+
+
+class BattleSnapshot:
+    """
+    某單位回合中的唯讀戰況：技能評分與 TargetStrategy 共用。
+    存活名單與排序取自隊伍索引（TeamRoster，戰鬥中由事件增量維護；
+    沒有時就地建立一份暫時索引），嘲諷 / 印記於第一次讀取時才掃描。
+    """
+    __slots__ = ("actor", "ally_roster", "enemy_roster", "_taunted", "_marks")
+
+    def __init__(self, actor, allies, enemies, ally_roster=None, enemy_roster=None):
+        self.actor = actor
+        self.ally_roster = ally_roster or TeamRoster(allies)
+        self.enemy_roster = enemy_roster or TeamRoster(enemies)
+        self._taunted = None
+        self._marks = None
+
+    @property
+    def allies(self):
+        return self.ally_roster.living
+
+    @property
+    def enemies(self):
+        return self.enemy_roster.living
+
+    def roster_for(self, units):
+        """units 是本快照的存活名單時回傳對應索引"""
+        if units is self.ally_roster.living:
+            return self.ally_roster
+        if units is self.enemy_roster.living:
+            return self.enemy_roster
+        return None
+
+    @property
+    def lowest_ally_ratio(self):
+        u = self.ally_roster.first("hp_ratio")
+        return None if u is None else u.hp / max(1, u.max_hp)
+
+    @property
+    def taunted(self):
+        if self._taunted is None:
+            self._taunted = tuple(e for e in self.enemies if _has_effect(e, Effect.TAUNT))
+        return self._taunted
+
+    @property
+    def marks(self):
+        """印記 key → 身上有該印記的敵人數"""
+        if self._marks is None:
+            marks = self._marks = {}
+            for e in self.enemies:
+                for key, n in getattr(e, "_marks", {}).items():
+                    if n > 0:
+                        marks[key] = marks.get(key, 0) + 1
+        return self._marks
+
+
+def _ranked(units, snap, key):
+    """依排序鍵取第一名：units 為快照的存活名單時查隊伍索引，否則就地掃描"""
+    roster = snap.roster_for(units) if snap else None
+    if roster is not None:
+        return roster.first(key)
+    fn, sign = KEYS[key]
+    return min(units, key=lambda u: sign * fn(u))
+
+
+# 定義目標篩選策略的映射（snap 為本回合的 BattleSnapshot）
 class TargetStrategy:
     @staticmethod
-    def low_hp(units, actor):
+    def low_hp(units, actor, snap=None):
         # 優先血量百分比最低
-        return sorted(units, key=lambda u: u.hp / max(1, u.max_hp))[0]
-    
+        return _ranked(units, snap, "hp_ratio")
+
     @staticmethod
-    def high_hp(units, actor):
+    def high_hp(units, actor, snap=None):
         # 優先血量數值最高
-        return sorted(units, key=lambda u: u.hp, reverse=True)[0]
-    
+        return _ranked(units, snap, "hp")
+
     @staticmethod
-    def low_def(units, actor):
+    def low_def(units, actor, snap=None):
         # 優先雙防總和最低
-        return sorted(units, key=lambda u: u.pdef + u.mdef)[0]
-    
+        return _ranked(units, snap, "defense")
+
     @staticmethod
-    def high_atk(units, actor):
+    def high_atk(units, actor, snap=None):
         # 優先雙攻總和最高 (威脅最大)
-        return sorted(units, key=lambda u: u.patk + u.matk, reverse=True)[0]
+        return _ranked(units, snap, "threat")
 
     @staticmethod
-    def random_target(units, actor):
-        return random.choice(units)
+    def random_target(units, actor, snap=None):
+        return unit_rng(actor).choice(units)
 
     @staticmethod
-    def self_target(units, actor):
+    def self_target(units, actor, snap=None):
         return actor
 
 class AIController:
@@ -44,55 +121,92 @@ class AIController:
         "SELF": TargetStrategy.self_target
     }
 
-    def __init__(self, ch=None, ui=None, feature=None):
+    def __init__(self, ch=None, ui=None, feature=None, profile=None, realtime=False):
         self.character = ch
         self.ui = ui
         self.feature = feature # 保留 Feature Enum 作為備用或標記
+        self._snap = None      # 本回合的 BattleSnapshot
+        self._rosters = (None, None, None)  # (回合主, 我方索引, 敵方索引)，BattleManager 提供
         
-        # 獲取 Profile 名稱
+        # 獲取 Profile 名稱（直接指定 > feature > Default）
         profile_name = "Default"
-        if hasattr(feature, "name"):
+        if profile:
+            profile_name = profile
+        elif hasattr(feature, "name"):
             profile_name = feature.name
         
-        self.profile = self.load_profile(profile_name)
+        self.ai_profile = ProfileLibrary.get(profile_name)  # 共用、已解析的設定
+        self.profile = self.ai_profile.data
+        self.planner = self._make_planner(self.ai_profile, realtime)  # realtime：GUI 戰鬥（搜尋加牆鐘安全上限）
+        self._plan = None  # 搜尋選定的 (行動者, {目標種類: 目標})
+
+    @staticmethod
+    def _make_planner(prof, realtime=False):
+        if not prof.planner:
+            return None
+        if prof.planner == "mcts":
+            from battle.planner import MCTSPlanner
+            return MCTSPlanner(**dict(prof.planner_options, realtime=realtime))
+        log(WARNING, "⚠️ 未知的 planner '{}'（設定 {}），改用一般規則", prof.planner, prof.name)
+        return None
+
+    def rules_only(self):
+        """同一份設定、不帶搜尋的一般規則控制器（搜尋型 AI 的模擬用；不重讀設定表）"""
+        ai = copy.copy(self)
+        ai.planner = None
+        ai._snap = ai._plan = None
+        ai._rosters = (None, None, None)
+        return ai
 
     @staticmethod
     def load_profile(name):
-        path = os.path.join("battle", "ai_profiles.json")
-        if not os.path.exists(path):
-            # 預設回傳，防止崩潰
-            return {"skill_priority": {}, "target_rule": "RANDOM"}
+        return ProfileLibrary.get(name).data
 
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # 取得設定，如果找不到則使用 Default
-        return data.get(name, data.get("Default", {}))
+    # --- 回合快照 ---
+    def begin_turn(self, actor, allies, enemies, ally_roster=None, enemy_roster=None):
+        """回合開始（選技前）建立快照；之後的評分與選目標共用"""
+        self._rosters = (actor, ally_roster, enemy_roster)
+        self._plan = None
+        self._snap = BattleSnapshot(actor, allies, enemies, ally_roster, enemy_roster)
+        return self._snap
+
+    def invalidate_snapshot(self):
+        """戰況已變（套用 Buff 後）：下一次選目標重新建立"""
+        self._snap = None
 
-    def score_skill(self, skill, actor, allies, enemies):
+    def _snapshot(self, actor, allies, enemies):
+        snap = getattr(self, "_snap", None)
+        if snap is None or snap.actor is not actor:
+            owner, ally_roster, enemy_roster = self._rosters
+            if owner is not actor:  #索引只屬於 begin_turn 的那個回合
+                ally_roster = enemy_roster = None
+            snap = self._snap = BattleSnapshot(actor, allies, enemies, ally_roster, enemy_roster)
+        return snap
+
+    def score_skill(self, skill, actor, allies, enemies, snap=None):
         total_score = 0
-        living_enemies = [e for e in enemies if not e.is_dead()]
-        living_allies = [a for a in allies if not a.is_dead()]
+        snap = snap or BattleSnapshot(actor, allies, enemies)
+        weights = self.ai_profile.weights
 
         # 1. 基礎權重計算 
         for buff in skill.buffs:
-            effect_name = buff.effect.name
+            effect = buff.effect
             # 從 profile 讀取分數
-            score = self.profile.get("skill_priority", {}).get(effect_name, 1)
+            score = weights[effect]
             
             # 2. 動態情境加分 
             
             # 印記引爆 (Combo)
-            if effect_name == "CONSUME_MARK":
+            if effect is Effect.CONSUME_MARK:
                 key = getattr(buff, "mark_key", None)
                 # 檢查是否有任何敵人身上有這層印記
-                if key and any(getattr(e, "_marks", {}).get(key, 0) > 0 for e in living_enemies):
+                if key and snap.marks.get(key):
                     score += 40 
 
             # 治療邏輯 (緊急救援)
-            elif effect_name == "ADDHP":
-                if living_allies:
-                    lowest_hp_ratio = min(a.hp / max(1, a.max_hp) for a in living_allies)
+            elif effect is Effect.ADDHP:
+                lowest_hp_ratio = snap.lowest_ally_ratio
+                if lowest_hp_ratio is not None:
                     if lowest_hp_ratio < 0.3: # 瀕死
                         score += 50
                     elif lowest_hp_ratio < 0.6: # 受傷
@@ -101,9 +215,8 @@ class AIController:
                         score -= 10
 
             # 自身保命 (坦克/脆皮邏輯)
-            elif effect_name in ["ADDSHIELD", "INVINCIBLE", "ADDPDEF"]:
-                hp_ratio = actor.hp / max(1, actor.max_hp)
-                if hp_ratio < 0.4:
+            elif effect in _SELF_GUARD:
+                if actor.hp / max(1, actor.max_hp) < 0.4:
                     score += 25
 
             total_score += score
@@ -117,47 +230,71 @@ class AIController:
         if not ch or not allies or not enemies:
             return None
             
+        if self.planner:
+            return self._search_skill(ch, allies, enemies)
+
         usable = [sk for sk in ch.skills if sk.cdtime == 0]
         if not usable:
             return None
 
         # 根據計算的分數排序
+        snap = self._snapshot(ch, allies, enemies)
         sorted_usable = sorted(
             usable, 
-            key=lambda sk: self.score_skill(sk, ch, allies, enemies), 
+            key=lambda sk: self.score_skill(sk, ch, allies, enemies, snap), 
             reverse=True
         )
         
         # 隨機性(取前兩高分的隨機一個，如果只有一個就選那個)
         candidates = sorted_usable[:2] if len(sorted_usable) > 1 else sorted_usable
-        return random.choice(candidates)
+        return unit_rng(ch).choice(candidates)
+
+    async def choose_skill_async(self, actor=None, allies=None, enemies=None):
+        """BattleManager.turn_async 用：一般規則直接算；搜尋型 AI 丟到執行緒池，搜尋期間事件迴圈照常運作"""
+        if self.planner:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.choose_skill, actor, allies, enemies)
+        return self.choose_skill(actor, allies, enemies)
+
+    def _search_skill(self, ch, allies, enemies):
+        """搜尋型 AI：技能與單體目標一起決定，目標留給 choose_target 使用"""
+        chosen = self.planner.choose(ch, list(allies), list(enemies))
+        if chosen is None:
+            return None
+        si, targets = chosen
+        self._plan = (ch, targets)
+        return ch.skills[si]
 
     def choose_target(self, buff, team, enemies, actor=None):
         ch = actor or self.character
-        living_team = [a for a in team if not a.is_dead()]
-        living_enemies = [e for e in enemies if not e.is_dead()]
+        plan = self._plan
+        if plan is not None and plan[0] is ch:
+            t = plan[1].get(buff.target)
+            if t is not None and not t.is_dead():
+                return t
+        snap = self._snapshot(ch, team, enemies)
 
         # 1. 強制性目標 
         if buff.target == Target.SELF:
             return ch
         elif buff.target == Target.TEAM:
-            return living_team # 群體技能回傳列表
+            return list(snap.allies) # 群體技能回傳列表
         elif buff.target == Target.ENEMIES:
-            return living_enemies # 群體攻擊回傳列表
+            return list(snap.enemies) # 群體攻擊回傳列表
 
         # 2. 選擇性目標 (單體)
         target_group = []
         default_rule = "RANDOM"
 
         if buff.target == Target.ALLY:
-            target_group = living_team
+            target_group = snap.allies
             # 支援型 AI 的目標規則
-            rule_key = self.profile.get("target_rule_ally", "LOW_HP") 
+            rule_key = self.ai_profile.rule_ally
         
         elif buff.target == Target.ENEMY:
-            target_group = living_enemies
+            target_group = snap.enemies
             # 攻擊型 AI 的目標規則
-            rule_key = self.profile.get("target_rule_enemy", self.profile.get("target_rule", "RANDOM"))
+            rule_key = self.ai_profile.rule_enemy
 
         if not target_group:
             return None
@@ -166,15 +303,10 @@ class AIController:
         strategy_func = self.STRATEGIES.get(rule_key, self.STRATEGIES["RANDOM"])
         
         # 嘲諷 (Taunt) 優先處理
-        if buff.target == Target.ENEMY:
-            taunted_enemies = [e for e in living_enemies if self._has_effect(e, Effect.TAUNT)]
-            if taunted_enemies:
-                return random.choice(taunted_enemies)
+        if buff.target == Target.ENEMY and snap.taunted:
+            return unit_rng(ch).choice(snap.taunted)
 
-        return strategy_func(target_group, ch)
+        return strategy_func(target_group, ch, snap)
 
     def _has_effect(self, ch, eff_enum) -> bool:
-        for b in getattr(ch, "buffs", []):
-            if getattr(b, "effect", None) == eff_enum and getattr(b, "duration", 0) != 0:
-                return True
-        return False
\ No newline at end of file
+        return _has_effect(ch, eff_enum)
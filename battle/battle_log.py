@@ -1,31 +1,152 @@
-_log_sink = None
-def set_log_sink(fn):  # fn: (str) -> None
-    global _log_sink
-    _log_sink = fn
+# battle/battle_log.py
+# 結構化戰鬥紀錄：呼叫端只交出 (等級, 格式, 參數)，真正有人要顯示時才組字串。
+#
+# - 等級低於門檻（或本執行緒靜音中）的紀錄在第一行就返回，不建立任何物件
+# - 兩個頻道：BATTLE（戰鬥過程，GUI 會接走）與 CONSOLE（回合標題 / 建立角色 / 升級 / 存檔等，原本直接 print 的訊息）
+# - 環狀緩衝：set_log_ring(n) 之後最近 n 筆紀錄（未格式化）留在記憶體，事後再檢視
+# - muted()：本執行緒內暫時不輸出（搜尋型 AI 的模擬戰鬥用，不影響其他執行緒）
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+OFF = 100
+
+BATTLE, CONSOLE = "battle", "console"
+
+
+class LogRecord:
+    """一筆紀錄；message 於第一次讀取時才格式化"""
+    __slots__ = ("level", "channel", "fmt", "args", "_text")
+
+    def __init__(self, level, channel, fmt, args):
+        self.level = level
+        self.channel = channel
+        self.fmt = fmt      # str.format 樣板，或 (*args) -> str
+        self.args = args
+        self._text = None
+
+    @property
+    def message(self) -> str:
+        if self._text is None:
+            fmt = self.fmt
+            self._text = fmt(*self.args) if callable(fmt) else fmt.format(*self.args)
+        return self._text
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f"LogRecord({self.level}, {self.channel!r}, {self.message!r})"
+
+
+_level = INFO
+_sinks = {BATTLE: None, CONSOLE: None}  # None = print
+_ring = None
+_echo = True
+
+
+class _Local(threading.local):
+    muted = 0  # 各執行緒的靜音層數（類別預設值：不必 getattr）
+
+
+_tls = _Local()
+
+
+def set_log_sink(fn, channel=BATTLE):  # fn: (str) -> None；None 恢復為 print
+    _sinks[channel] = fn
+
+
+def set_log_level(level):
+    """低於 level 的紀錄直接丟棄；批次模擬用 OFF 關掉所有輸出"""
+    global _level
+    _level = level
+
+
+def get_log_level():
+    return _level
+
+
+def enabled(level=INFO) -> bool:
+    """呼叫端要先組較貴的參數時，用它先擋一次"""
+    return level >= _level and not _tls.muted
+
+
+def set_log_ring(size, *, echo=True):
+    """
+    size > 0：把最近 size 筆紀錄保留在記憶體（ring_records() 取回）；0 關閉。
+    echo=False 時只進環狀緩衝、不送 sink（無頭執行的事後檢查模式）。
+    """
+    global _ring, _echo
+    _ring = deque(maxlen=size) if size > 0 else None
+    _echo = echo or _ring is None
+
+
+def ring_records(channel=None):
+    if _ring is None:
+        return []
+    return [r for r in _ring if channel is None or r.channel == channel]
+
+
+def dump_ring(channel=None) -> str:
+    return "\n".join(r.message for r in ring_records(channel))
+
+
+@contextmanager
+def muted():
+    """with muted(): 區塊內本執行緒的紀錄一律丟棄（可巢狀）"""
+    _tls.muted += 1
+    try:
+        yield
+    finally:
+        _tls.muted -= 1
+
+
+def log(level, fmt, *args, channel=CONSOLE):
+    if level < _level or _tls.muted:
+        return
+    _emit(LogRecord(level, channel, fmt, args))
+
+
+def _emit(record):
+    if _ring is not None:
+        _ring.append(record)
+    if _echo:
+        sink = _sinks.get(record.channel)
+        if sink:
+            sink(record.message)
+        else:
+            print(record.message)
+
 
 def _out(msg: str):
-    if _log_sink:
-        _log_sink(msg)
-    else:
-        print(msg)
+    if INFO >= _level and not _tls.muted:
+        _emit(LogRecord(INFO, BATTLE, "{}", (msg,)))
+
+
+def _fmt_buff(name, effect, val):
+    if val >= 0:
+        return f"{name} 提升了 {val:.0f} 點 {effect}"
+    return f"{name} 降低了 {-val:.0f} 點 {effect}"
+
 
 class BattleLog:
     @staticmethod
     def output_damage(src, tgt, dmg):
-        _out(f"{src} 對 {tgt} 造成 {dmg:.0f} 點傷害")
+        if INFO >= _level and not _tls.muted:
+            _emit(LogRecord(INFO, BATTLE, "{} 對 {} 造成 {:.0f} 點傷害", (src, tgt, dmg)))
 
     @staticmethod
     def output_buff(name, effect, val):
-        if val >= 0:
-            _out(f"{name} 提升了 {val:.0f} 點 {effect}")
-        else:
-            _out(f"{name} 降低了 {-val:.0f} 點 {effect}")
+        if INFO >= _level and not _tls.muted:
+            _emit(LogRecord(INFO, BATTLE, _fmt_buff, (name, effect, val)))
 
     @staticmethod
     def output_dot(name, effect, val):
-        _out(f"{name} 損失了 {abs(val):.0f} 點血量 ， 因為 {effect}")
+        if INFO >= _level and not _tls.muted:
+            _emit(LogRecord(INFO, BATTLE, "{} 損失了 {:.0f} 點血量 ， 因為 {}", (name, abs(val), effect)))
 
     @staticmethod
     def output_miss(src, tgt):
-        _out(f"{src} 攻擊 {tgt} 被閃避了！")
-
+        if INFO >= _level and not _tls.muted:
+            _emit(LogRecord(INFO, BATTLE, "{} 攻擊 {} 被閃避了！", (src, tgt)))
@@ -0,0 +1,42 @@
+# battle/battle_loop.py
+# 非同步戰鬥的事件迴圈：BattleManager.battle_async 以 task 執行
+#
+# - GUI：整個程式共用一個背景事件迴圈（daemon 執行緒），每場戰鬥 submit() 成一個 task；
+#   玩家輸入由 Tk 回呼 resolve() 直接完成 future，不再用執行緒等待 / 輪詢
+# - 無介面：run_battles() 把多場戰鬥放在同一個事件迴圈上同時跑（各場需有自己的 BattleManager）
+import asyncio
+import threading
+
+_loop = None
+_lock = threading.Lock()
+
+
+def battle_loop():
+    """共用的背景事件迴圈（第一次呼叫時啟動）"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="battle-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def submit(coro):
+    """把協程丟到共用事件迴圈；回傳 concurrent.futures.Future（可 add_done_callback）"""
+    return asyncio.run_coroutine_threadsafe(coro, battle_loop())
+
+
+def resolve(fut, value):
+    """任何執行緒（例如 Tk 按鈕回呼）都可呼叫：完成 future；已完成 / 已取消則忽略（連點）"""
+    def _set():
+        if not fut.done():
+            fut.set_result(value)
+    fut.get_loop().call_soon_threadsafe(_set)
+
+
+async def run_battles(matches):
+    """matches：(BattleManager, 隊伍 A, 隊伍 B) 的序列；全部打完後回傳各場 A 隊是否還有人活著"""
+    matches = list(matches)
+    await asyncio.gather(*(bm.battle_async(a, b) for bm, a, b in matches))
+    return [bm.alive(a) for bm, a, _ in matches]
@@ -1,8 +1,12 @@
-from battle.event_manager import event_manager, EventType
+from battle.event_manager import EventManager, EventType
 from battle.buff import Target, Phase
 from battle.ai_controller import AIController
-from battle.battle_log import BattleLog
-import copy
+from battle.roster import TeamRoster
+from battle.checkpoint import capture, restore
+from battle.battle_log import BattleLog, log, INFO
+from battle.rng import new_seed
+import asyncio
+import random
 
 
 class CLIController:
@@ -29,13 +33,35 @@ class CLIController:
                 pass
 
 class BattleManager:
-    def __init__(self, controller=None):
+    def __init__(self, controller=None, events=None, seed=None, rng=None):
         self.controller = controller or CLIController()
+        # 本戰鬥專屬的事件匯流排：不同 BattleManager 的戰鬥互不干擾，可同時執行
+        self.events = events or EventManager()
+        # 本戰鬥專屬的亂數流：給定 seed 即可重現整場戰鬥
+        self.seed = seed if seed is not None else new_seed()
+        self.rng = rng or random.Random(self.seed)
+        self.rosters = {}  # tuple(隊伍成員) → TeamRoster（戰鬥期間由事件增量維護；傳入複製的 list 也查得到）
+
+    def bind(self, units):
+        # 讓角色（以及其 buff 的訂閱、判定與 AI 選擇）走本戰鬥的匯流排與亂數流
+        for c in units:
+            c.events = self.events
+            c.rng = self.rng
+
+    # === 存檔點（倒帶 / 重試 / 搜尋型 AI） ===
+    def checkpoint(self, team_a, team_b):
+        """存下雙方狀態與本戰鬥的亂數流"""
+        return capture(list(team_a) + list(team_b), self.rng)
+
+    def rewind(self, cp, team_a, team_b):
+        """還原到 checkpoint()（隊伍與順序需相同）"""
+        restore(cp, list(team_a) + list(team_b), self.rng)
 
     def battle(self, team_a, team_b):
+        self._begin_battle(team_a, team_b)
         round_num = 1
         while self.alive(team_a) and self.alive(team_b):
-            print(f"\n===== 第 {round_num} 回合 =====")
+            log(INFO, "\n===== 第 {} 回合 =====", round_num)
 
             # A隊行動
             for member in team_a:
@@ -51,101 +77,218 @@ class BattleManager:
 
             round_num += 1
 
+        self._end_battle(team_a, team_b)
+
+    def _begin_battle(self, team_a, team_b):
+        self.bind(team_a)
+        self.bind(team_b)
+        self.rosters = {tuple(t): TeamRoster(t, self.events) for t in (team_a, team_b)}
+
+    def _end_battle(self, team_a, team_b):
         # 判斷勝負
         if not self.alive(team_a) and not self.alive(team_b):
-            print("⚔️ 雙方同歸於盡！")
+            log(INFO, "⚔️ 雙方同歸於盡！")
         elif not self.alive(team_a):
-            print("☠️ A隊全滅，B隊勝利！")
+            log(INFO, "☠️ A隊全滅，B隊勝利！")
         else:
-            print("☠️ B隊全滅，A隊勝利！")
+            log(INFO, "☠️ B隊全滅，A隊勝利！")
 
-    def turn(self, src, allies, enemies):
-        print(f"\n--- {src.name} 的回合 ---")
-        event_manager.emit(EventType.TURN_START, actor=src)
-        src.trigger_phase(Phase.START)
-        
-        controller = getattr(src, "controller", self.controller)
+        for r in self.rosters.values():
+            r.dispose()
+        self.rosters = {}
 
-        #接收 ctx，判斷是否被 cancel
-        ctx = event_manager.emit(EventType.BEFORE_ACTION, actor=src)
-        if getattr(ctx, "canceled", False):
-            BattleLog.output_buff(src.name, "被控制狀態，無法行動", 0)
-            # 回合結束
-            event_manager.emit(EventType.TURN_END, actor=src)
-            src.trigger_phase(Phase.END)
-            src.buff_end_round()
-            src.reduce_cd()
+    def turn(self, src, allies, enemies):
+        controller = self._start_turn(src)
+        if controller is None:
             return
-            
+
         # === 1) 選技能 ===
         if isinstance(controller, AIController):# AI 選技能
+            self._ai_begin(controller, src, allies, enemies)
             skill = controller.choose_skill(actor=src,allies=allies,enemies=enemies)  #皆傳入
-            if not skill:
-                print(f"{src.name} 沒有技能可用，跳過回合。")
-                # 結束回合
-                event_manager.emit(EventType.TURN_END, actor=src)
-                src.trigger_phase(Phase.END)
-                src.buff_end_round()
-                src.reduce_cd()
+            skill_buffs = self._ai_used(controller, src, skill)
+            if skill_buffs is None:
                 return
-            skill_buffs = skill.be_used()
-            print(f"{src.name} 使用技能【{skill.name}】")
         else:
             idx = controller.select_skill(src)
             skill_buffs = src.choose_skill(idx)
 
             # 若技能冷卻中，提示並重新選擇
             while skill_buffs == []:
-                # GUI 模式：顯示提示訊息
-                if hasattr(controller, "ui") and controller.ui:
-                    controller.ui.call_on_ui(controller.ui.append_log, f"⚠️ {src.name} 的技能正在冷卻中，請重新選擇！")
-                else:
-                    print(f"⚠️ {src.name} 的技能正在冷卻中，請重新選擇！")
-
+                self._warn_cooldown(controller, src)
                 idx = controller.select_skill(src)
                 skill_buffs = src.choose_skill(idx)
 
             # 成功選定技能才繼續
 
+        self.cast(src, allies, enemies, controller, skill_buffs)
 
+    def cast(self, src, allies, enemies, controller, skill_buffs):
+        """技能已選定之後的半個回合：選目標、套用 Buff、回合收尾（搜尋型 AI 的模擬也走這裡）"""
         # === 2) 套用 Buff / 選目標 ===
-        event_manager.emit(EventType.SKILL_CAST, actor=src, data={"buffs": skill_buffs})
+        self.events.fire(EventType.SKILL_CAST, actor=src, data={"buffs": skill_buffs})
 
         for buff in skill_buffs:
             # 取得目標
             if isinstance(controller, AIController):
                 tgt = controller.choose_target(buff, allies, enemies, actor=src)  # ★ 把 src 傳進去
             else:
-                if buff.target == Target.SELF:
-                    tgt = src
-                elif buff.target == Target.ALLY:
-                    tgt = controller.select_target(allies, "選擇我方單位")
-                elif buff.target == Target.ENEMY:
-                    tgt = controller.select_target(enemies, "選擇敵人")
-                elif buff.target == Target.TEAM:
-                    tgt = allies
-                elif buff.target == Target.ENEMIES:
-                    tgt = enemies
+                ask = self._target_prompt(buff, allies, enemies)
+                tgt = controller.select_target(*ask) if ask else self._fixed_target(src, buff, allies, enemies)
+            self._deliver(src, buff, tgt, controller)
+
+        self._resolve(src, skill_buffs)
+
+    # === 非同步版：控制器回傳 awaitable，多場戰鬥可在同一個事件迴圈上當 task 跑 ===
+    # 控制器若有 select_skill_async / select_target_async / choose_skill_async 就 await 它；
+    # 只有同步版的（例如 CLIController）丟到執行緒池，不擋住事件迴圈。
+    # 流程、事件與亂數的使用順序與同步版相同：同一個 seed 打出同一場戰鬥。
+    async def battle_async(self, team_a, team_b):
+        self._begin_battle(team_a, team_b)
+        round_num = 1
+        while self.alive(team_a) and self.alive(team_b):
+            log(INFO, "\n===== 第 {} 回合 =====", round_num)
+
+            for team, other in ((team_a, team_b), (team_b, team_a)):
+                for member in team:
+                    if not member.is_dead():
+                        await self.turn_async(member, team, other)
+                        await asyncio.sleep(0)  # 每個單位回合讓出一次，其他戰鬥 / UI 才跑得動
+                        if not self.alive(other): break
+
+            round_num += 1
+
+        self._end_battle(team_a, team_b)
+
+    async def turn_async(self, src, allies, enemies):
+        controller = self._start_turn(src)
+        if controller is None:
+            return
+
+        if isinstance(controller, AIController):
+            self._ai_begin(controller, src, allies, enemies)
+            skill = await controller.choose_skill_async(actor=src, allies=allies, enemies=enemies)
+            skill_buffs = self._ai_used(controller, src, skill)
+            if skill_buffs is None:
+                return
+        else:
+            skill_buffs = src.choose_skill(await self._ask(controller, "select_skill", src))
+            while skill_buffs == []:
+                self._warn_cooldown(controller, src)
+                skill_buffs = src.choose_skill(await self._ask(controller, "select_skill", src))
+
+        await self.cast_async(src, allies, enemies, controller, skill_buffs)
+
+    async def cast_async(self, src, allies, enemies, controller, skill_buffs):
+        self.events.fire(EventType.SKILL_CAST, actor=src, data={"buffs": skill_buffs})
+
+        for buff in skill_buffs:
+            if isinstance(controller, AIController):
+                tgt = controller.choose_target(buff, allies, enemies, actor=src)
+            else:
+                ask = self._target_prompt(buff, allies, enemies)
+                if ask:
+                    tgt = await self._ask(controller, "select_target", *ask)
                 else:
-                    tgt = None
+                    tgt = self._fixed_target(src, buff, allies, enemies)
+            self._deliver(src, buff, tgt, controller)
+
+        self._resolve(src, skill_buffs)
 
-            # 發動（支援單體 / 多體）
-            if isinstance(tgt, list):
-                for t in tgt:
-                    if t and not t.is_dead():
-                        t.receive_buff(src, copy.deepcopy(buff))
-            elif tgt:
-                if not getattr(tgt, "is_dead", lambda: False)():
-                    tgt.receive_buff(src, copy.deepcopy(buff))
+    @staticmethod
+    async def _ask(controller, name, *args):
+        """呼叫控制器的 name_async；沒有的話把同步版丟到執行緒池"""
+        fn = getattr(controller, name + "_async", None)
+        if fn is not None:
+            return await fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, getattr(controller, name), *args)
 
-        event_manager.emit(EventType.SKILL_RESOLVE, actor=src, data={"buffs": skill_buffs})
-        event_manager.emit(EventType.TURN_END, actor=src)
+    # === 同步 / 非同步共用的回合片段 ===
+    def _start_turn(self, src):
+        """回合開始到行動判定：回傳本回合的控制器；被控制無法行動時收尾並回傳 None"""
+        log(INFO, "\n--- {} 的回合 ---", src.name)
+        em = self.events
+        em.fire(EventType.TURN_START, actor=src)
+        src.trigger_phase(Phase.START)
+        
+        controller = getattr(src, "controller", self.controller)
+
+        #接收 ctx，判斷是否被 cancel
+        ctx = em.emit(EventType.BEFORE_ACTION, actor=src)
+        canceled = getattr(ctx, "canceled", False)
+        if canceled:
+            BattleLog.output_buff(src.name, "被控制狀態，無法行動", 0)
+            self._end_turn(src)
+            return None
+        return controller
+
+    def _end_turn(self, src):
+        self.events.fire(EventType.TURN_END, actor=src)
 
         # === 3) 回合收尾 ===
         src.trigger_phase(Phase.END)
         src.buff_end_round()
         src.reduce_cd()
 
+    def _ai_begin(self, controller, src, allies, enemies):
+        rosters = self.rosters
+        controller.begin_turn(src, allies, enemies,
+                              rosters.get(tuple(allies)), rosters.get(tuple(enemies)))  # 本回合快照：評分 / 選目標共用
+
+    def _ai_used(self, controller, src, skill):
+        """AI 選定的技能進入冷卻並回傳其 Buff；沒有技能可用時結束回合並回傳 None"""
+        if not skill:
+            log(INFO, "{} 沒有技能可用，跳過回合。", src.name)
+            controller.invalidate_snapshot()
+            self._end_turn(src)
+            return None
+        skill_buffs = skill.be_used()
+        log(INFO, "{} 使用技能【{}】", src.name, skill.name)
+        return skill_buffs
+
+    @staticmethod
+    def _warn_cooldown(controller, src):
+        # GUI 模式：顯示提示訊息
+        if hasattr(controller, "ui") and controller.ui:
+            controller.ui.call_on_ui(controller.ui.append_log, f"⚠️ {src.name} 的技能正在冷卻中，請重新選擇！")
+        else:
+            print(f"⚠️ {src.name} 的技能正在冷卻中，請重新選擇！")
+
+    @staticmethod
+    def _target_prompt(buff, allies, enemies):
+        """玩家要親自挑的單體目標：回傳 (候選, 提示)；其餘回傳 None"""
+        if buff.target == Target.ALLY:
+            return allies, "選擇我方單位"
+        if buff.target == Target.ENEMY:
+            return enemies, "選擇敵人"
+        return None
+
+    @staticmethod
+    def _fixed_target(src, buff, allies, enemies):
+        if buff.target == Target.SELF:
+            return src
+        if buff.target == Target.TEAM:
+            return allies
+        if buff.target == Target.ENEMIES:
+            return enemies
+        return None
+
+    def _deliver(self, src, buff, tgt, controller):
+        # 發動（支援單體 / 多體）
+        if isinstance(tgt, list):
+            for t in tgt:
+                if t and not t.is_dead():
+                    t.receive_buff(src, buff.instantiate())
+        elif tgt:
+            if not getattr(tgt, "is_dead", lambda: False)():
+                tgt.receive_buff(src, buff.instantiate())
+        if isinstance(controller, AIController):
+            controller.invalidate_snapshot()  # 戰況已變，下一個 Buff 重新取快照
+
+    def _resolve(self, src, skill_buffs):
+        self.events.fire(EventType.SKILL_RESOLVE, actor=src, data={"buffs": skill_buffs})
+        self._end_turn(src)
+
     def choose_target(self, candidates):
         living = [c for c in candidates if not c.is_dead()]
         while True:
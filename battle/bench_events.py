@@ -0,0 +1,85 @@
+# battle/bench_events.py
+# EventManager 微基準：python -m battle.bench_events
+# 與舊版作法（每次 emit 都 list() 複製 + 新建 dataclass ctx）比較
+import timeit
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from battle.event_manager import EventManager, EventType
+
+
+# --- 舊版 EventManager（僅供對照） ---
+@dataclass
+class _LegacyContext:
+    actor: Any = None
+    target: Any = None
+    skill: Any = None
+    dmg: float = 0.0
+    data: Dict[str, Any] = field(default_factory=dict)
+    canceled: bool = False
+    stop: bool = False
+
+
+class _LegacyEventManager:
+    def __init__(self):
+        self._listeners = {}
+
+    def subscribe(self, event, handler, *, priority=0, **_):
+        lst = self._listeners.setdefault(event, [])
+        lst.append((priority, handler))
+        lst.sort(key=lambda e: -e[0])
+
+    def emit(self, event, **kwargs):
+        ctx = kwargs.get("ctx") or _LegacyContext()
+        for k, v in kwargs.items():
+            if k != "ctx":
+                setattr(ctx, k, v)
+        for _, handler in list(self._listeners.get(event, [])):
+            handler(event, ctx)
+            if ctx.stop:
+                break
+        return ctx
+
+
+class _Unit:
+    pass
+
+
+def _noop(ev, ctx):
+    pass
+
+
+def _bench(stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    return best / number * 1e9  # ns / 次
+
+
+def main(number: int = 200_000):
+    units = [_Unit() for _ in range(8)]
+    hit = units[0]
+
+    legacy, current = _LegacyEventManager(), EventManager()
+
+    # 8 名單位，各掛 3 個「只看自己」的 AFTER_TAKE_DAMAGE 監聽（反傷/反擊/無敵類）
+    for u in units:
+        for prio in (100, 200, 300):
+            legacy.subscribe(EventType.AFTER_TAKE_DAMAGE, _noop, priority=prio)
+            current.subscribe(EventType.AFTER_TAKE_DAMAGE, _noop, priority=prio, target=u)
+
+    cases = [
+        ("TURN_START（無監聽者）",
+         lambda: legacy.emit(EventType.TURN_START, actor=hit),
+         lambda: current.fire(EventType.TURN_START, actor=hit)),
+        ("AFTER_TAKE_DAMAGE（8 單位 × 3 監聽）",
+         lambda: legacy.emit(EventType.AFTER_TAKE_DAMAGE, actor=units[1], target=hit, dmg=10.0),
+         lambda: current.fire(EventType.AFTER_TAKE_DAMAGE, actor=units[1], target=hit, dmg=10.0)),
+    ]
+
+    print(f"{'情境':<34}{'舊版 ns':>10}{'現行 ns':>10}{'加速':>8}")
+    for label, old, new in cases:
+        t_old, t_new = _bench(old, number), _bench(new, number)
+        print(f"{label:<34}{t_old:>10.0f}{t_new:>10.0f}{t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
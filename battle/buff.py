@@ -51,4 +51,84 @@ class Buff():#效果
         self.source = None
         self.applied = []#紀錄數值變化
         self._fresh = False
-    
\ No newline at end of file
+    
+    def instantiate(self):
+        """套用到目標時建立的執行期實例（取代整份 deepcopy）"""
+        return BuffInstance(self)
+
+class BuffInstance():#套用中的效果
+    """
+    共用 Buff 模板的不可變欄位（名稱、效果、數值…），
+    只持有會變動的執行期狀態：duration / applied / source / extra。
+    """
+    __slots__ = ("template","duration","applied","source","extra","_fresh")
+
+    def __init__(self,template):
+        self.template = template
+        self.duration = template.duration
+        self.applied = []#紀錄數值變化
+        self.source = None
+        self.extra = None
+        self._fresh = False
+
+    # --- 模板欄位（唯讀） ---
+    target  = property(lambda self: self.template.target)
+    phase   = property(lambda self: self.template.phase)
+    name    = property(lambda self: self.template.name)
+    desc    = property(lambda self: self.template.desc)
+    effect  = property(lambda self: self.template.effect)
+    percent = property(lambda self: self.template.percent)
+    base    = property(lambda self: self.template.base)
+    mark_key = property(lambda self: getattr(self.template, "mark_key", None))
+
+class BuffStore():#角色身上的效果
+    """
+    依 Phase 分桶的 Buff 容器：START / END 結算只走訪該階段的 Buff，
+    到期的 Buff 以 dict 刪除（O(1)），不再 list.remove。
+    走訪順序與加入順序相同（與原本的 list 一致）。
+    """
+    __slots__ = ("_all","_phase","_pending","_seq")
+
+    def __init__(self):
+        self._all = {}  #buff → 加入序號（dict 保留插入順序）
+        self._phase = {p: {} for p in Phase}
+        self._pending = []  #不在本階段、但持續回合已 ≤ 0 的 Buff（加入時即 ≤ 0，或被外部改寫）
+        self._seq = 0
+
+    def __iter__(self):
+        return iter(tuple(self._all))
+
+    def __len__(self):
+        return len(self._all)
+
+    def __bool__(self):
+        return bool(self._all)
+
+    def __contains__(self, buff):
+        return buff in self._all
+
+    def append(self, buff):
+        self._seq += 1
+        self._all[buff] = self._seq
+        self._phase[buff.phase][buff] = None
+        if buff.duration <= 0:
+            self._pending.append(buff)
+
+    def expire_later(self, buff):
+        """外部把 duration 改成 ≤ 0 時呼叫：下一次結算（任何階段）一併移除"""
+        if buff in self._all:
+            self._pending.append(buff)
+
+    def discard(self, buff):
+        if self._all.pop(buff, None) is not None:
+            del self._phase[buff.phase][buff]
+
+    def of_phase(self, phase):
+        """結算用：該階段 Buff 與待移除 Buff 依加入順序合併（快照，可在走訪中移除）"""
+        own = tuple(self._phase[phase])
+        if not self._pending:
+            return own
+        pending, self._pending = self._pending, []
+        seq = self._all
+        extra = [b for b in dict.fromkeys(pending) if b in seq and b.phase != phase]
+        return tuple(sorted(own + tuple(extra), key=seq.__getitem__))
@@ -0,0 +1,147 @@
+# battle/checkpoint.py
+# 戰鬥存檔點：把雙方角色的狀態存成純值（tuple），之後可原地還原。
+#
+# - 存：屬性（目前值 / 上限 / 護盾 / 暈眩計數…）、屬性修正、技能冷卻與等級、印記、
+#   Buff（模板 / 剩餘回合 / 已套用數值 / 施放者 / extra），以及各 Buff 在匯流排上的訂閱先後
+# - 還原：先拆掉角色身上現有 Buff 的訂閱，再以新的 BuffInstance 依原訂閱先後重新掛上
+#   （EffectRegistry.resubscribe，只掛 handler、不重新套數值）；已自行退訂的 Buff 不會再掛
+# - 亂數流以 getstate / setstate 一併存回
+# 用途：搜尋型 AI 的模擬、倒帶、劇情戰鬥重試
+from operator import attrgetter
+
+from battle.buff import BuffInstance, BuffStore
+from battle.effect_registry import EffectRegistry
+from battle.event_manager import EventType
+from battle.skill import Skill
+from character.character import Character
+
+# 需要存的 slot：不含容器 / 匯流排 / 亂數流，以及建立後不變的名稱、職業、成長表
+_STATE = tuple(s for s in Character.__slots__ if s not in (
+    "buffs", "skills", "events", "rng", "_mods", "__dict__", "__weakref__",
+    "name", "job", "stats", "_job_growth"))
+_get_state = attrgetter(*_STATE)
+
+
+class Checkpoint:
+    """
+    capture() 的結果：units[i] 對應存檔時的第 i 個角色；rng 為亂數流狀態（可為 None）。
+    orphans 為仍掛在匯流排上、但不在任何人 Buff 列表裡的 Buff（持續 0 回合的引爆 / 準備窗等）。
+    """
+    __slots__ = ("units", "orphans", "rng")
+
+    def __init__(self, units, orphans, rng):
+        self.units = units
+        self.orphans = orphans
+        self.rng = rng
+
+
+def _subscribed(bus, index):
+    """匯流排上由 Buff 持有的訂閱：Buff → (持有者編號, 最早的訂閱序號)；只收 index 裡的角色"""
+    resub = EffectRegistry.resubscribe
+    out = {}
+    for owner in bus.owners():
+        if type(owner) is not BuffInstance or owner.effect not in resub:
+            continue
+        subs = bus.subscriptions(owner)  # [(訂閱序號, 篩選的 actor / target)]
+        if not subs:
+            continue
+        i = index.get(subs[0][1])
+        if i is None:
+            i = index.get(owner.source)
+        if i is not None:
+            out[owner] = (i, min(seq for seq, _ in subs))
+    return out
+
+
+def _pack(b, index, seq):
+    extra = b.extra
+    return (b.template, b.duration, tuple(b.applied), index.get(b.source, b.source),
+            tuple(extra.items()) if isinstance(extra, dict) else extra, b._fresh, seq)
+
+
+def _unpack(v, units):
+    tpl, duration, applied, src, extra, fresh, seq = v
+    b = BuffInstance(tpl)
+    b.duration = duration
+    b.applied = list(applied)
+    b.source = units[src] if type(src) is int else src
+    b.extra = dict(extra) if isinstance(extra, tuple) else extra
+    b._fresh = fresh
+    return b, seq
+
+
+def capture(units, rng=None) -> Checkpoint:
+    """存下 units（依順序）的狀態；rng 省略時取第一個角色所屬戰鬥的亂數流"""
+    units = list(units)
+    index = {u: i for i, u in enumerate(units)}
+    subs = {}
+    for bus in {id(u.events): u.events for u in units}.values():
+        subs.update(_subscribed(bus, index))
+    out = []
+    for u in units:
+        buffs = tuple(_pack(b, index, subs.pop(b, (None, None))[1]) for b in u.buffs)
+        mods = u._mods
+        marks = u.__dict__.get("_marks")
+        out.append((
+            _get_state(u),
+            tuple((i, m[0], m[1], m[2]) for i, m in mods.items()) if mods else None,
+            tuple((s.template, s.cd, s.cdtime, s.currLevel) for s in u.skills),
+            tuple(marks.items()) if marks is not None else None,
+            buffs,
+        ))
+    orphans = tuple((i, _pack(b, index, seq)) for b, (i, seq) in subs.items())
+    if rng is None and units:
+        rng = getattr(units[0], "rng", None)
+    return Checkpoint(tuple(out), orphans, rng.getstate() if rng is not None else None)
+
+
+def restore(cp: Checkpoint, units, rng=None, bus=None):
+    """
+    把 cp 寫回 units（順序需與 capture 時相同；可以是另一組同構的角色，例如模擬用的複本）。
+    bus 指定時所有角色改走該匯流排（視為全新，不必拆舊訂閱）；rng 指定時一併還原亂數流。
+    """
+    units = list(units)
+    if bus is None:
+        index = {u: i for i, u in enumerate(units)}
+        for em in {id(u.events): u.events for u in units}.values():
+            for b in _subscribed(em, index):
+                em.unsubscribe_owner(b)
+    subs = []
+    for u, (vals, mods, skills, marks, buffs) in zip(units, cp.units):
+        if bus is not None:
+            u.events = bus
+
+        for name, v in zip(_STATE, vals):
+            setattr(u, name, v)
+        u._mods = {i: [f, p, n] for i, f, p, n in mods} if mods else None
+
+        if len(u.skills) != len(skills):
+            u.skills = [Skill.__new__(Skill) for _ in skills]
+        for s, (tpl, cd, cdtime, lv) in zip(u.skills, skills):
+            s.template, s.cd, s.cdtime, s.currLevel = tpl, cd, cdtime, lv
+
+        if marks is not None:
+            u._marks = dict(marks)
+        else:
+            u.__dict__.pop("_marks", None)
+
+        store = BuffStore()
+        for v in buffs:
+            b, seq = _unpack(v, units)
+            store.append(b)
+            if seq is not None:
+                subs.append((seq, u, b))
+        u.buffs = store
+    for i, v in cp.orphans:
+        b, seq = _unpack(v, units)
+        subs.append((seq, units[i], b))
+
+    # 依原訂閱先後重新掛上（同優先的 handler 觸發順序與存檔時相同）
+    subs.sort(key=lambda s: s[0])
+    for _, u, b in subs:
+        EffectRegistry.resubscribe[b.effect](b.source, u, b)
+
+    if rng is not None and cp.rng is not None:
+        rng.setstate(cp.rng)
+    for u in units:  # 數值整批改寫：通知隊伍索引等監聽者
+        u.events.fire(EventType.STAT_CHANGE, target=u)
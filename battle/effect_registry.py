@@ -1,6 +1,8 @@
 from battle.buff import Effect
 from battle.battle_log import BattleLog,_out
 from battle.event_manager import event_manager, EventType, EventContext
+from battle.rng import unit_rng
+from types import MappingProxyType
 
 # =========================
 # effect_registry.py (final)
@@ -10,28 +12,38 @@ from battle.event_manager import event_manager, EventType, EventContext
 # - DOT 走完整事件管線（支援無敵/護盾）
 # - 標記機制（MARK / CONSUME_MARK / PREP_WINDOW）
 # - AFTER_TAKE_DAMAGE 順序：THORNS(100) → COUNTER(200) → LIFESTEAL(300)
+# - 事件走持有 buff 之單位所屬的戰鬥匯流排（unit.events）
 # =========================
 
-import random
+# --- 單位所屬的事件匯流排（未綁定戰鬥時退回全域單例） ---
+def _bus(unit):
+    return getattr(unit, "events", None) or event_manager
 
-# --- 暴擊判定（chance: 0~1） ---
-def cri(chance: float) -> bool:
+# --- 暴擊判定（chance: 0~1；rng 為該場戰鬥的亂數流） ---
+def cri(chance: float, rng=None) -> bool:
     chance = max(0.0, min(1.0, float(chance)))
-    return random.random() < chance
+    return (rng or unit_rng(None)).random() < chance
+
+# AFTER_ATTACK 的 data：暴擊時帶 {"crit": True}（共用唯讀，handler 不可修改）
+_CRIT = MappingProxyType({"crit": True})
 
 # --- 命中/閃避 ---
 def _roll_hit(src, tgt):
-    ctx = event_manager.emit(
+    em = _bus(src)
+    # 需讀回 hit/miss_rate：自備 ctx（不走無監聽者的 NOOP 捷徑）
+    ctx = em.emit(
         EventType.BEFORE_ATTACK,
-        actor=src,
-        target=tgt,
-        hit=getattr(src, "hit", 0.0),
-        miss=getattr(tgt, "miss", 0.0),
+        ctx=EventContext(
+            actor=src,
+            target=tgt,
+            hit=getattr(src, "hit", 0.0),
+            miss_rate=getattr(tgt, "miss", 0.0),
+        ),
     )
     hit_val  = max(0.0, min(1.0, float(getattr(ctx, "hit", 0.0))))
-    miss_val = max(0.0, min(1.0, float(getattr(ctx, "miss", 0.0))))
+    miss_val = max(0.0, min(1.0, float(getattr(ctx, "miss_rate", 0.0))))
     evade_chance = max(0.0, min(0.95, miss_val - hit_val))
-    evaded = random.random() < evade_chance
+    evaded = unit_rng(src).random() < evade_chance
     return (not evaded), 1.0 - evade_chance  # (命中?, 命中率)
 
 # --- 輕量標記桶 ---
@@ -44,15 +56,18 @@ def _mark_bucket(obj):
 class EffectRegistry:
     apply = {}
     remove = {}
+    # 只重新掛上事件訂閱、不改任何數值（複製 / 還原戰鬥狀態時用）
+    resubscribe = {}
 
     @staticmethod
     def init():
         # =============== 主動傷害（物理/魔法） ===============
         def _apply_damage_core(src, tgt, buff, atk_attr: str, def_attr: str):
+            em = _bus(src)
             ok, _ = _roll_hit(src, tgt)
             if not ok:
                 BattleLog.output_miss(src.name, tgt.name)
-                event_manager.emit(EventType.AFTER_ATTACK, actor=src, target=tgt, dmg=0.0, miss=True)
+                em.fire(EventType.AFTER_ATTACK, actor=src, target=tgt, dmg=0.0, missed=True)
                 return
 
             # 1) 基礎傷（屬性正確）
@@ -61,7 +76,7 @@ class EffectRegistry:
             base = max(0.0, atk * float(buff.percent) + float(buff.base) - deff)
 
             # 2) BEFORE_ATTACK：允許外部效果調整乘數/加成
-            ctx = event_manager.emit(
+            ctx = em.emit(
                 EventType.BEFORE_ATTACK,
                 actor=src,
                 target=tgt,
@@ -73,7 +88,8 @@ class EffectRegistry:
             dmg = max(0.0, base * mult + add)
 
             # 3) 暴擊（若有）
-            if cri(getattr(src, "cri", 0.0)):
+            crit = cri(getattr(src, "cri", 0.0), unit_rng(src))
+            if crit:
                 dmg *= max(1.0, float(getattr(src, "cridmg", 1.5)))
 
             # 4) 走正式傷害管線（支援無敵/護盾/反擊）
@@ -82,7 +98,8 @@ class EffectRegistry:
             delta = before - tgt.hp
 
             BattleLog.output_damage(src.name, tgt.name, delta)
-            event_manager.emit(EventType.AFTER_ATTACK, actor=src, target=tgt, dmg=float(delta))
+            em.fire(EventType.AFTER_ATTACK, actor=src, target=tgt, dmg=float(delta),
+                    data=_CRIT if crit else None)
 
         # 物理傷害（patk vs pdef）
         def apply_physic(src, tgt, buff):
@@ -111,29 +128,31 @@ class EffectRegistry:
 
         # =============== 屬性增減（有移除時回復） ===============
 
-        def _apply_stat(delta_fn_name, max_attr_name, label):
+        # Buff 登記為屬性修正（Character.add_modifier），移除時撤銷同一筆修正，
+        # 不必依實際變化量逐筆回放；下限裁切由推導時處理，不會累積誤差
+        from character.character import PATK, PDEF, MATK, MDEF, CRI, CRIDMG, HIT, MISS
+
+        def _apply_stat(stat, label):
             def _apply(src, tgt, buff):
-                add = float(getattr(tgt, max_attr_name)) * float(buff.percent) + float(buff.base)
-                before = float(getattr(tgt, label[0]))
-                getattr(tgt, delta_fn_name)(add)
-                after = float(getattr(tgt, label[0]))
-                d = after - before
-                buff.applied.append(d)
-                BattleLog.output_buff(tgt.name, label[1], d)
+                add = float(tgt.get_max_stat(stat)) * float(buff.percent) + float(buff.base)
+                before = float(tgt.get_stat(stat))
+                tgt.add_modifier(stat, add)
+                buff.applied.append(add)
+                BattleLog.output_buff(tgt.name, label, float(tgt.get_stat(stat)) - before)
             def _remove(src, tgt, buff):
-                for applied in buff.applied:
-                    getattr(tgt, delta_fn_name)(-applied)
+                for add in buff.applied:
+                    tgt.remove_modifier(stat, add)
                 buff.applied.clear()
             return _apply, _remove
 
-        EffectRegistry.apply[Effect.ADDPATK], EffectRegistry.remove[Effect.ADDPATK] = _apply_stat("add_patk", "max_patk", ("patk", "物理攻擊力"))
-        EffectRegistry.apply[Effect.ADDPDEF], EffectRegistry.remove[Effect.ADDPDEF] = _apply_stat("add_pdef", "max_pdef", ("pdef", "物理防禦力"))
-        EffectRegistry.apply[Effect.ADDMATK], EffectRegistry.remove[Effect.ADDMATK] = _apply_stat("add_matk", "max_matk", ("matk", "魔法攻擊力"))
-        EffectRegistry.apply[Effect.ADDMDEF], EffectRegistry.remove[Effect.ADDMDEF] = _apply_stat("add_mdef", "max_mdef", ("mdef", "魔法防禦力"))
-        EffectRegistry.apply[Effect.ADDCRI],  EffectRegistry.remove[Effect.ADDCRI]  = _apply_stat("add_cri",  "max_cri",  ("cri",  "爆擊率"))
-        EffectRegistry.apply[Effect.ADDCRIDMG], EffectRegistry.remove[Effect.ADDCRIDMG] = _apply_stat("add_cridmg", "max_cridmg", ("cridmg", "爆擊傷害"))
-        EffectRegistry.apply[Effect.ADDHIT],  EffectRegistry.remove[Effect.ADDHIT]  = _apply_stat("add_hit",  "max_hit",  ("hit",  "命中率"))
-        EffectRegistry.apply[Effect.ADDMISS], EffectRegistry.remove[Effect.ADDMISS] = _apply_stat("add_miss", "max_miss", ("miss", "閃避率"))
+        EffectRegistry.apply[Effect.ADDPATK], EffectRegistry.remove[Effect.ADDPATK] = _apply_stat(PATK, "物理攻擊力")
+        EffectRegistry.apply[Effect.ADDPDEF], EffectRegistry.remove[Effect.ADDPDEF] = _apply_stat(PDEF, "物理防禦力")
+        EffectRegistry.apply[Effect.ADDMATK], EffectRegistry.remove[Effect.ADDMATK] = _apply_stat(MATK, "魔法攻擊力")
+        EffectRegistry.apply[Effect.ADDMDEF], EffectRegistry.remove[Effect.ADDMDEF] = _apply_stat(MDEF, "魔法防禦力")
+        EffectRegistry.apply[Effect.ADDCRI],  EffectRegistry.remove[Effect.ADDCRI]  = _apply_stat(CRI,  "爆擊率")
+        EffectRegistry.apply[Effect.ADDCRIDMG], EffectRegistry.remove[Effect.ADDCRIDMG] = _apply_stat(CRIDMG, "爆擊傷害")
+        EffectRegistry.apply[Effect.ADDHIT],  EffectRegistry.remove[Effect.ADDHIT]  = _apply_stat(HIT,  "命中率")
+        EffectRegistry.apply[Effect.ADDMISS], EffectRegistry.remove[Effect.ADDMISS] = _apply_stat(MISS, "閃避率")
 
         # =============== 護盾（可疊加，移除時回退） ===============
 
@@ -158,7 +177,9 @@ class EffectRegistry:
 
         def apply_dot(src, tgt, buff):
             base = max(0.0, float(tgt.max_hp) * float(buff.percent) + float(buff.base))
-            ctx = event_manager.emit(EventType.BEFORE_TAKE_DAMAGE, target=tgt, actor=src, dmg=base)
+            em = _bus(tgt)
+            ctx = em.emit(EventType.BEFORE_TAKE_DAMAGE,
+                          ctx=EventContext(target=tgt, actor=src, dmg=base))
             dmg = max(0.0, float(getattr(ctx, "dmg", base)))
             if dmg <= 0.0:
                 BattleLog.output_buff(tgt.name, f"{buff.name} 被免疫", 0)
@@ -178,17 +199,20 @@ class EffectRegistry:
             for bb in getattr(tgt, "buffs", []):
                 if bb is buff:   # 關鍵：用身分比較，不用 id
                     return
+            sub_invincible(src, tgt, buff)
+
+        def sub_invincible(src, tgt, buff):
             def on_before_take_damage(ev, ctx, _t=tgt):
-                if ctx.target is _t:
-                    ctx.dmg = 0.0
-                    BattleLog.output_buff(_t.name, "無敵", 0)
-            event_manager.subscribe(EventType.BEFORE_TAKE_DAMAGE, on_before_take_damage,
-                                    priority=1000, owner=buff)
+                ctx.dmg = 0.0
+                BattleLog.output_buff(_t.name, "無敵", 0)
+            _bus(tgt).subscribe(EventType.BEFORE_TAKE_DAMAGE, on_before_take_damage,
+                                    priority=1000, owner=buff, target=tgt)
 
         def remove_invincible(src, tgt, buff):
-            event_manager.unsubscribe_owner(buff)
+            _bus(tgt).unsubscribe_owner(buff)
 
         EffectRegistry.apply[Effect.INVINCIBLE]  = apply_invincible
+        EffectRegistry.resubscribe[Effect.INVINCIBLE] = sub_invincible
         EffectRegistry.remove[Effect.INVINCIBLE] = remove_invincible
 
         # =============== 反傷（在無敵之後、反擊之前） ===============
@@ -196,18 +220,19 @@ class EffectRegistry:
         def apply_thorns(src, tgt, buff):
             ratio = float(buff.percent)
             def on_after_take_damage(ev, ctx: EventContext, _t=tgt, _r=ratio):
-                if ctx.target is _t and ctx.actor is not None and ctx.dmg > 0:
+                if ctx.actor is not None and ctx.dmg > 0:
                     reflect = int(round(ctx.dmg * _r))
                     ctx.actor.take_damage(reflect, attacker=_t)
                     BattleLog.output_damage(_t.name, ctx.actor.name, reflect)
-            event_manager.subscribe(
+            _bus(tgt).subscribe(
                 EventType.AFTER_TAKE_DAMAGE, on_after_take_damage,
-                priority=100, owner=buff
+                priority=100, owner=buff, target=tgt
             )
         def remove_thorns(src, tgt, buff):
-            event_manager.unsubscribe_owner(buff)
+            _bus(tgt).unsubscribe_owner(buff)
 
         EffectRegistry.apply[Effect.THORNS]  = apply_thorns
+        EffectRegistry.resubscribe[Effect.THORNS] = apply_thorns
         EffectRegistry.remove[Effect.THORNS] = remove_thorns
 
         # =============== 反擊（固定在反傷之後） ===============
@@ -215,19 +240,20 @@ class EffectRegistry:
         def apply_counter(src, tgt, buff):
             ratio, base = float(buff.percent), float(buff.base)
             def on_after_take_damage(ev, ctx: EventContext, _t=tgt, _r=ratio, _base=base):
-                if ctx.target is _t and ctx.dmg > 0 and ctx.actor is not None:
+                if ctx.dmg > 0 and ctx.actor is not None:
                     counter_dmg = max(0, int(round(ctx.dmg * _r + _base)))
                     before = ctx.actor.hp
                     ctx.actor.take_damage(counter_dmg, attacker=_t)
                     BattleLog.output_damage(_t.name, ctx.actor.name, before - ctx.actor.hp)
-            event_manager.subscribe(
+            _bus(tgt).subscribe(
                 EventType.AFTER_TAKE_DAMAGE, on_after_take_damage,
-                priority=200, owner=buff
+                priority=200, owner=buff, target=tgt
             )
         def remove_counter(src, tgt, buff):
-            event_manager.unsubscribe_owner(buff)
+            _bus(tgt).unsubscribe_owner(buff)
 
         EffectRegistry.apply[Effect.COUNTER]  = apply_counter
+        EffectRegistry.resubscribe[Effect.COUNTER] = apply_counter
         EffectRegistry.remove[Effect.COUNTER] = remove_counter
 
         # =============== 吸血（最後結算） ===============
@@ -235,19 +261,20 @@ class EffectRegistry:
         def apply_lifesteal(src, tgt, buff):
             ratio, base = float(buff.percent), float(buff.base)
             def on_after_take_damage(ev, ctx: EventContext, _s=src, _r=ratio, _base=base):
-                if ctx.actor is _s and ctx.dmg > 0:
+                if ctx.dmg > 0:
                     heal = max(0, int(round(ctx.dmg * _r + _base)))
                     before = _s.hp
                     _s.add_hp(heal)
                     BattleLog.output_buff(_s.name, "吸血回復", _s.hp - before)
-            event_manager.subscribe(
+            _bus(tgt).subscribe(
                 EventType.AFTER_TAKE_DAMAGE, on_after_take_damage,
-                priority=300, owner=buff
+                priority=300, owner=buff, actor=src
             )
         def remove_lifesteal(src, tgt, buff):
-            event_manager.unsubscribe_owner(buff)
+            _bus(tgt).unsubscribe_owner(buff)
 
         EffectRegistry.apply[Effect.LIFESTEAL]  = apply_lifesteal
+        EffectRegistry.resubscribe[Effect.LIFESTEAL] = apply_lifesteal
         EffectRegistry.remove[Effect.LIFESTEAL] = remove_lifesteal
 
         # =============== 標記系統（MARK / CONSUME_MARK / PREP_WINDOW） ===============
@@ -264,9 +291,6 @@ class EffectRegistry:
         # CONSUME_MARK：於 BEFORE_ATTACK 消耗印記，依 buff.percent / buff.base 作為每層增傷
         def apply_consume_mark(src, tgt, buff):
             def on_before_attack(ev, ctx: EventContext, _t=tgt, _b=buff):
-                if ctx.target is not _t:
-                    return
-
                 # 只在真正的傷害前那次 BEFORE_ATTACK 才生效：
                 data = getattr(ctx, "data", None)
                 if not isinstance(data, dict) or ("dmg_mult" not in data and "dmg_add" not in data):
@@ -286,32 +310,33 @@ class EffectRegistry:
                 ctx.data = data
 
                 marks[key] = 0  # 消耗所有層
-                event_manager.unsubscribe_owner(_b)  # 僅影響這一擊
-            event_manager.subscribe(EventType.BEFORE_ATTACK, on_before_attack, owner=buff, priority=250)
+                _bus(_t).unsubscribe_owner(_b)  # 僅影響這一擊
+            _bus(tgt).subscribe(EventType.BEFORE_ATTACK, on_before_attack, owner=buff, priority=250,
+                                    target=tgt)
 
         def remove_consume_mark(src, tgt, buff):
-            event_manager.unsubscribe_owner(buff)
+            _bus(tgt).unsubscribe_owner(buff)
 
         EffectRegistry.apply[Effect.CONSUME_MARK]  = apply_consume_mark
+        EffectRegistry.resubscribe[Effect.CONSUME_MARK] = apply_consume_mark
         EffectRegistry.remove[Effect.CONSUME_MARK] = remove_consume_mark
 
         # PREP_WINDOW：於 BEFORE_ATTACK 加乘（例如下一擊 +X%）
         def apply_prep_window(src, tgt, buff):
             def on_before_attack(ev, ctx: EventContext, _s=src, _b=buff):
-                if ctx.actor is not _s:
-                    return
                 data = dict(ctx.data or {})
                 data["dmg_mult"] = float(data.get("dmg_mult", 1.0)) * (1.0 + float(getattr(_b, "percent", 0.0)))
                 ctx.data = data
-            event_manager.subscribe(
+            _bus(tgt).subscribe(
                 EventType.BEFORE_ATTACK, on_before_attack,
-                owner=buff, priority=150  
+                owner=buff, priority=150, actor=src
             )
 
         def remove_prep_window(src, tgt, buff):
-            event_manager.unsubscribe_owner(buff)
+            _bus(tgt).unsubscribe_owner(buff)
 
         EffectRegistry.apply[Effect.PREP_WINDOW]  = apply_prep_window
+        EffectRegistry.resubscribe[Effect.PREP_WINDOW] = apply_prep_window
         EffectRegistry.remove[Effect.PREP_WINDOW] = remove_prep_window
         
         #嘲諷(使AI選敵人時優先選擇)
@@ -333,10 +358,10 @@ class EffectRegistry:
 
             tgt.stun = max(0, getattr(tgt, "stun", 0)) + charges
             BattleLog.output_buff(tgt.name, f"陷入暈眩（{charges} 回合）", 0)
+            sub_stun(src, tgt, buff)
 
+        def sub_stun(src, tgt, buff):
             def on_before_action(ev, ctx: EventContext, _t=tgt, _b=buff):
-                if ctx.actor is not _t:
-                    return
                 left = int(_b.extra.get("_stun_left", 0))
                 if left <= 0:
                     return
@@ -347,14 +372,15 @@ class EffectRegistry:
                 _t.remove_stun()  # 角色計數 -1
 
                 if _b.extra["_stun_left"] <= 0:
-                    event_manager.unsubscribe_owner(_b)
-                    try:
-                        _t.remove_buff_by_id(_b.id)
-                    except Exception:
-                        _b.duration = 0
+                    _bus(_t).unsubscribe_owner(_b)
+                    _b.duration = 0
+                    # 由下一次結算移除（BuffStore 只在該 Buff 的階段檢查，需另外標記）
+                    expire = getattr(_t.buffs, "expire_later", None)
+                    if expire:
+                        expire(_b)
 
-            event_manager.subscribe(EventType.BEFORE_ACTION, on_before_action,
-                                    priority=1000, owner=buff)
+            _bus(tgt).subscribe(EventType.BEFORE_ACTION, on_before_action,
+                                    priority=1000, owner=buff, actor=tgt)
 
         def remove_stun(src, tgt, buff):
             # 被驅散時，把「尚未消耗」的次數從角色身上扣回來
@@ -364,9 +390,10 @@ class EffectRegistry:
                 buff.extra["_stun_left"] = 0
             if left > 0:
                 tgt.stun = max(0, getattr(tgt, "stun", 0) - left)
-            event_manager.unsubscribe_owner(buff)
+            _bus(tgt).unsubscribe_owner(buff)
 
 
 
         EffectRegistry.apply[Effect.STUN]  = apply_stun
+        EffectRegistry.resubscribe[Effect.STUN] = sub_stun
         EffectRegistry.remove[Effect.STUN] = remove_stun
\ No newline at end of file
@@ -1,6 +1,7 @@
 from enum import Enum,auto 
-from dataclasses import dataclass, field
-from typing import Any,Callable,Dict,List
+from types import MappingProxyType
+from typing import Any,Callable,Dict,List,Optional,Tuple
+from bisect import bisect_left, insort
 
 class EventType(Enum):
     TURN_START = auto()
@@ -15,62 +16,225 @@ class EventType(Enum):
     REMOVE_BUFF = auto()
     SKILL_CAST = auto()
     SKILL_RESOLVE = auto()
+    STAT_CHANGE = auto()   #血量（傷害以外）或屬性變動；target = 角色
 
-@dataclass
 class EventContext:
-    actor : Any = None
-    target: Any = None
-    skill: Any = None
-    dmg: float = 0.0
-    data: Dict[str,Any] = field(default_factory=dict)
-    canceled:bool = False
-    stop: bool = False
+    """
+    事件上下文：以 __slots__ 宣告所有用到的欄位（不再長出 __dict__）。
+    data 於第一次讀取時才建立。
+    """
+    __slots__ = ("actor","target","skill","dmg","_data","canceled","stop","hit","miss_rate","missed")
+
+    def __init__(self, actor: Any = None, target: Any = None, skill: Any = None,
+                 dmg: float = 0.0, data: Optional[Dict[str,Any]] = None,
+                 canceled: bool = False, stop: bool = False,
+                 hit: float = 0.0, miss_rate: float = 0.0, missed: bool = False):
+        self.actor = actor
+        self.target = target
+        self.skill = skill
+        self.dmg = dmg
+        self._data = data
+        self.canceled = canceled
+        self.stop = stop
+        self.hit = hit              #命中率（BEFORE_ATTACK 命中判定用）
+        self.miss_rate = miss_rate  #閃避率（BEFORE_ATTACK 命中判定用）
+        self.missed = missed        #AFTER_ATTACK：這次攻擊是否落空
+
+    @property
+    def data(self) -> Dict[str,Any]:
+        if self._data is None:
+            self._data = {}
+        return self._data
+
+    @data.setter
+    def data(self, value: Dict[str,Any]):
+        self._data = value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """讀 data[key]，不會為了讀取而建立 data"""
+        d = self._data
+        return default if d is None else d.get(key, default)
     
     def cancel(self): self.canceled = True
     def stop_propagation(self): self.stop = True
     
+class _NoopContext(EventContext):
+    """沒有監聽者時 emit 回傳的共用唯讀 ctx。"""
+    __slots__ = ()
+
+    def __init__(self):
+        for name in EventContext.__slots__:
+            object.__setattr__(self, name, None)
+        object.__setattr__(self, "dmg", 0.0)
+        object.__setattr__(self, "_data", MappingProxyType({}))
+        object.__setattr__(self, "canceled", False)
+        object.__setattr__(self, "stop", False)
+        object.__setattr__(self, "hit", 0.0)
+        object.__setattr__(self, "miss_rate", 0.0)
+        object.__setattr__(self, "missed", False)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NOOP_CONTEXT 為共用唯讀物件")
+
+    def cancel(self): raise AttributeError("NOOP_CONTEXT 為共用唯讀物件")
+    def stop_propagation(self): raise AttributeError("NOOP_CONTEXT 為共用唯讀物件")
+
+NOOP_CONTEXT = _NoopContext()
+
 Handler = Callable[[EventType,EventContext],None]
 
 class _Entry:
-    __slots__ = ("priority","handler","once","owner") 
-    def __init__(self,priority:int ,handler: Handler,once: bool,owner: Any):
+    __slots__ = ("priority","handler","once","owner","seq","home") 
+    def __init__(self,priority:int ,handler: Handler,once: bool,owner: Any,seq: int = 0):
         self.priority = priority
         self.handler  = handler
         self.once = once
         self.owner = owner
+        self.seq = seq  #同優先時依訂閱先後
+        self.home = None  #(所屬 _EventListeners, 索引 dict 或 None, key)；移除後為 None
+
+def _order(e: _Entry):
+    return (-e.priority, e.seq)
+
+class _EventListeners:
+    """單一事件的監聽者：派發用的不可變 tuple，只在訂閱變動時重建。"""
+    __slots__ = ("all","by_actor","by_target")
+    def __init__(self):
+        self.all: Tuple[_Entry, ...] = ()
+        # 以 actor / target 為 key 的監聽者：emit 時只查該單位的 tuple
+        self.by_actor: Dict[Any,Tuple[_Entry, ...]] = {}
+        self.by_target: Dict[Any,Tuple[_Entry, ...]] = {}
+
+    def dispatch(self, actor: Any, target: Any) -> Tuple[_Entry, ...]:
+        by_actor = by_target = ()
+        if actor is not None and self.by_actor:
+            by_actor = self.by_actor.get(actor, ())
+        if target is not None and self.by_target:
+            by_target = self.by_target.get(target, ())
+        if not by_actor and not by_target:
+            return self.all
+        if not self.all and not (by_actor and by_target):
+            return by_actor or by_target
+        return tuple(sorted(self.all + by_actor + by_target, key=_order))
 
 class EventManager:
     def __init__(self):
-        self._listeners: Dict [EventType,List[_Entry]] = {}
+        self._events: Dict[EventType,_EventListeners] = {}
+        # owner → 其訂閱項，移除時只碰自己的項目
+        self._by_owner: Dict[Any,List[_Entry]] = {}
+        self._seq = 0
     
     def subscribe(self,event: EventType,handler: Handler, *,
-                  priority: int = 0,once: bool = False,owner: Any = None):
-        lst = self._listeners.setdefault(event,[])
-        lst.append(_Entry(priority,handler,once,owner))
-        #高優先先執行
-        lst.sort(key = lambda e : -e.priority)
+                  priority: int = 0,once: bool = False,owner: Any = None,
+                  actor: Any = None, target: Any = None):
+        """
+        actor / target：只在 ctx.actor / ctx.target 為該物件時才觸發（擇一）。
+        未指定則對所有 emit 觸發。
+        """
+        if actor is not None and target is not None:
+            raise ValueError("subscribe 只能指定 actor 或 target 其中之一")
+        self._seq += 1
+        entry = _Entry(priority,handler,once,owner,self._seq)
+        rec = self._events.get(event)
+        if rec is None:
+            rec = self._events[event] = _EventListeners()
+        if actor is not None:
+            index, key = rec.by_actor, actor
+        elif target is not None:
+            index, key = rec.by_target, target
+        else:
+            index, key = None, None
+        entry.home = (rec, index, key)
+        #高優先先執行：二分插入，維持 (-priority, seq) 排序
+        lst = list(rec.all if index is None else index.get(key, ()))
+        insort(lst, entry, key=_order)
+        if index is None:
+            rec.all = tuple(lst)
+        else:
+            index[key] = tuple(lst)
+        if owner is not None:
+            self._by_owner.setdefault(owner,[]).append(entry)
         return handler #token
     
+    def _remove(self, entry: _Entry, *, from_owner: bool = True):
+        if entry.home is None:
+            return
+        rec, index, key = entry.home
+        entry.home = None
+        lst = rec.all if index is None else index.get(key, ())
+        # (-priority, seq) 唯一，二分即可定位
+        i = bisect_left(lst, _order(entry), key=_order)
+        if i < len(lst) and lst[i] is entry:
+            lst = lst[:i] + lst[i+1:]
+            if index is None:
+                rec.all = lst
+            elif lst:
+                index[key] = lst
+            else:
+                del index[key]  #單位的 tuple 清空就移除，避免死亡單位殘留
+        if from_owner and entry.owner is not None:
+            owned = self._by_owner.get(entry.owner)
+            if owned:
+                owned.remove(entry)
+                if not owned:
+                    del self._by_owner[entry.owner]
+    
     def unsubscribe(self,event : EventType,handler: Handler):
-        lst = self._listeners.get(event)
-        if not lst: return
-        self._listeners[event] = [e for e in lst if e.handler is not handler]
+        rec = self._events.get(event)
+        if rec is None:
+            return
+        lists = [rec.all, *rec.by_actor.values(), *rec.by_target.values()]
+        for e in [e for lst in lists for e in lst if e.handler is handler]:
+            self._remove(e)
     
     def unsubscribe_owner(self,owner: Any):
-        for ev, lst in self._listeners.items():
-            self._listeners[ev] = [e for e in lst if e.owner is not owner]
+        for e in self._by_owner.pop(owner, ()):
+            self._remove(e, from_owner=False)
+
+    def clear(self):
+        """拆掉全部訂閱（重複使用同一條匯流排時用，例如搜尋型 AI 每次模擬前）"""
+        self._events = {}
+        self._by_owner = {}
+
+    def owners(self) -> Tuple[Any, ...]:
+        """目前持有訂閱的 owner（呼叫當下的快照，走訪時可安全退訂）"""
+        return tuple(self._by_owner)
+
+    def subscriptions(self, owner: Any) -> List[Tuple[int, Any]]:
+        """owner 的訂閱：[(訂閱序號, 篩選的 actor / target；全域訂閱為 None)]，依訂閱先後"""
+        return [(e.seq, e.home[2]) for e in self._by_owner.get(owner, ()) if e.home is not None]
     
-    def emit(self,event:EventType, **kwargs)->EventContext:
-        ctx: EventContext = kwargs.get("ctx") or EventContext()
-        
-        for k ,v in kwargs.items():
-            if k != "ctx" :
+    def emit(self,event:EventType, ctx: Optional[EventContext] = None, **kwargs)->EventContext:
+        """
+        沒有任何監聽者且未傳入 ctx 時，直接回傳共用的 NOOP_CONTEXT（不配置、不帶入 kwargs）；
+        需要讀回 handler 修改結果的呼叫端請自行傳入 ctx。
+        """
+        return self._emit(event, ctx, kwargs)
+
+    def fire(self, event: EventType, **kwargs):
+        """只通知、不讀回結果的 emit。"""
+        self._emit(event, None, kwargs)
+
+    def _emit(self, event: EventType, ctx: Optional[EventContext], kwargs: Dict[str,Any]) -> EventContext:
+        rec = self._events.get(event)
+        if ctx is None:
+            if rec is None:
+                return NOOP_CONTEXT
+            entries = rec.dispatch(kwargs.get("actor"), kwargs.get("target"))
+            if not entries:
+                return NOOP_CONTEXT
+            ctx = EventContext(**kwargs)
+        else:
+            for k ,v in kwargs.items():
                 setattr(ctx,k,v)
+            if rec is None:
+                return ctx
+            entries = rec.dispatch(ctx.actor, ctx.target)
         
-        for entry in list(self._listeners.get(event,[])):
+        for entry in entries:
             entry.handler(event, ctx) 
             if entry.once:
-                self.unsubscribe(event, entry.handler)
+                self._remove(entry)
             if ctx.stop:
                 break
         return ctx
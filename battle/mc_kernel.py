@@ -0,0 +1,601 @@
+# battle/mc_kernel.py
+# 向量化蒙地卡羅核心（平衡測試專用，需要 numpy）：
+# 把兩隊角色編譯成「結構陣列」，N 場戰鬥以同一個回合順序同步推進，
+# 命中 / 暴擊 / 傷害 / DOT 等擲骰一次對整條「場次軸」批次處理。
+#
+# - 只支援不依賴事件連鎖的效果子集（SUPPORTED）；其餘效果在編譯時直接拒絕
+# - 回合流程、AI 選技 / 選目標規則與 BattleManager + AIController 相同，
+#   差別只在亂數來源（numpy Generator）與同一單位多個 Buff 的槽位順序
+# - 正確性以 `python -m battle.sim validate` 對照 BattleManager 的統計結果
+import os
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from battle.buff import Effect, Phase, Target
+from battle.sim import FIELDS, PairStats
+
+# 屬性欄位（stat 陣列第 3 軸）
+COLS = ("patk", "pdef", "matk", "mdef", "cri", "cridmg", "hit", "miss")
+PATK, PDEF, MATK, MDEF, CRI, CRIDMG, HIT, MISS = range(len(COLS))
+
+# 屬性 Buff → (欄位, 下限)；下限與 Character.STAT_FLOOR 相同
+_STAT_EFFECTS = {
+    Effect.ADDPATK: (PATK, 0.0),
+    Effect.ADDPDEF: (PDEF, 0.0),
+    Effect.ADDMATK: (MATK, 0.0),
+    Effect.ADDMDEF: (MDEF, 0.0),
+    Effect.ADDCRI: (CRI, 0.0),
+    Effect.ADDCRIDMG: (CRIDMG, 1.5),
+    Effect.ADDHIT: (HIT, 0.0),
+    Effect.ADDMISS: (MISS, 0.0),
+}
+
+SUPPORTED = frozenset({
+    Effect.PHYSICDAMAGE, Effect.MAGICDAMAGE, Effect.DOT, Effect.ADDHP,
+    Effect.ADDSHIELD, Effect.TAUNT, Effect.INVINCIBLE, *_STAT_EFFECTS,
+})
+# END 階段每回合重複套用：只允許不需回退、也不讀施放者數值的效果
+# （START 階段的 Buff 目前資料中沒有，核心也不支援）
+_TICKABLE = frozenset({Effect.DOT, Effect.ADDHP})
+# 持續時間 0 的 INVINCIBLE 會永久掛著監聽者，不在支援範圍
+_NEEDS_DURATION = frozenset({Effect.INVINCIBLE})
+
+# AI 目標規則（與 AIController.STRATEGIES 同名）
+_RULES = ("LOW_HP", "HIGH_HP", "WEAKEST_DEF", "HIGHEST_ATK", "RANDOM", "SELF")
+
+
+def check_skill(skill):
+    """回傳技能中不支援的效果名稱列表（空列表代表可編譯）"""
+    bad = []
+    for b in skill.buffs:
+        if b.effect not in SUPPORTED:
+            bad.append(b.effect.name)
+        elif b.phase == Phase.START or (b.phase == Phase.END and b.effect not in _TICKABLE):
+            bad.append(f"{b.effect.name}@{b.phase.name}")
+        elif b.effect in _NEEDS_DURATION and b.duration == 0:
+            bad.append(f"{b.effect.name}(duration=0)")
+    return bad
+
+
+def unsupported(job):
+    """回傳職業技能中不支援的效果；空列表代表可用本核心模擬"""
+    from battle.skill_library import SkillLibrary
+    from character.jobs_library import JobLibrary
+    bad = []
+    for name in JobLibrary.get(job).get("skills", []):
+        skill = SkillLibrary.get(name)
+        if skill is not None:
+            bad.extend(f"{name}:{e}" for e in check_skill(skill))
+    return bad
+
+
+def supported_jobs():
+    from character.jobs_library import JobLibrary
+    return [j for j in JobLibrary.jobs if not unsupported(j)]
+
+
+def _build_team(job, level, size):
+    from character.character import Character
+    team = [Character(f"{job}{i}", job) for i in range(size)]
+    for c in team:
+        c.set_lv(level)
+    return team
+
+
+class _Compiled:
+    """兩隊角色攤平後的唯讀資料：單位數值、技能表與 Buff 模板表"""
+
+    def __init__(self, team_a, team_b, profile):
+        units = list(team_a) + list(team_b)
+        self.size_a = len(team_a)
+        self.n_units = len(units)
+        self.side = np.array([0] * len(team_a) + [1] * len(team_b))
+
+        self.hp0 = np.array([float(u.hp) for u in units])
+        self.max_hp = np.array([float(u.max_hp) for u in units])
+        self.shield0 = np.array([float(getattr(u, "shield", 0.0)) for u in units])
+        self.stat0 = np.array([[float(getattr(u, c)) for c in COLS] for u in units])
+        self.max_stat = np.array([[float(getattr(u, "max_" + c)) for c in COLS] for u in units])
+
+        prio = profile.get("skill_priority", {})
+        self.rule_ally = profile.get("target_rule_ally", "LOW_HP")
+        self.rule_enemy = profile.get("target_rule_enemy", profile.get("target_rule", "RANDOM"))
+
+        # Buff 模板表（同一模板只編一次）；最後一列是空槽 (-1) 的哨兵
+        templates, index = [], {}
+
+        def tpl_id(buff):
+            key = id(buff)
+            if key not in index:
+                index[key] = len(templates)
+                templates.append(buff)
+            return index[key]
+
+        # skills[u] = [(cd, (模板編號...)), ...]
+        self.skills = []
+        self.score_base, self.n_heal, self.n_guard, self.heal_done = [], [], [], []
+        for u in units:
+            rows = []
+            base, heal, guard, done = [], [], [], []
+            for sk in u.skills:
+                bad = check_skill(sk)
+                if bad:
+                    raise ValueError(f"{u.job} 的技能「{sk.name}」含不支援的效果：{', '.join(bad)}")
+                rows.append((sk.cd, tuple(tpl_id(b) for b in sk.buffs)))
+                base.append(sum(prio.get(b.effect.name, 1) for b in sk.buffs))
+                heal.append(sum(b.effect == Effect.ADDHP for b in sk.buffs))
+                guard.append(sum(b.effect in (Effect.ADDSHIELD, Effect.INVINCIBLE, Effect.ADDPDEF)
+                                 for b in sk.buffs))
+                # 與 test.py 的治療量統計相同：每次施放按施放者最大血量計
+                done.append(sum(u.max_hp * b.percent + b.base
+                                for b in sk.buffs if b.effect == Effect.ADDHP))
+            self.skills.append(rows)
+            self.score_base.append(np.array(base, float))
+            self.n_heal.append(np.array(heal, float))
+            self.n_guard.append(np.array(guard, float))
+            self.heal_done.append(done)
+        self.max_skills = max((len(r) for r in self.skills), default=0)
+
+        self.templates = templates
+        n = len(templates) + 1
+        self.eff = [b.effect for b in templates]
+        self.target = [b.target for b in templates]
+        self.phase_of = np.array([b.phase.value for b in templates] + [-1])
+        self.dur_of = np.array([int(b.duration) for b in templates] + [0])
+        self.pct_of = np.array([float(b.percent) for b in templates] + [0.0])
+        self.base_of = np.array([float(b.base) for b in templates] + [0.0])
+        self.has_end = any(b.phase == Phase.END for b in templates)
+        # 存入後要經過幾次「持有者回合結束」才解除（duration ≤ 0 的也會撐到第一次）
+        self.life_of = np.array([max(1, int(b.duration)) for b in templates] + [1])
+        self.wheel = int(self.life_of.max()) + 1
+        self.is_dot = np.array([b.effect == Effect.DOT for b in templates] + [False])
+        self.is_heal = np.array([b.effect == Effect.ADDHP for b in templates] + [False])
+        self.is_shield = np.array([b.effect == Effect.ADDSHIELD for b in templates] + [False])
+        self.is_taunt = np.array([b.effect == Effect.TAUNT for b in templates] + [False])
+        self.is_inv = np.array([b.effect == Effect.INVINCIBLE for b in templates] + [False])
+        self.col_of = np.full(n, -1)
+        self.reverts = np.array([b.effect in _STAT_EFFECTS or b.effect == Effect.ADDSHIELD
+                                 for b in templates] + [False])
+        self.floor_of = np.zeros(n)
+        for i, b in enumerate(templates):
+            if b.effect in _STAT_EFFECTS:
+                self.col_of[i], self.floor_of[i] = _STAT_EFFECTS[b.effect]
+
+
+class MonteCarloKernel:
+    """
+    N 場相同陣容的戰鬥，以 lanes 條「車道」同步推進。
+    某條車道的戰鬥結束後，在下一輪開始前換上一場新戰鬥（連續批次），
+    避免少數超長戰鬥拖著整批陣列空轉。
+    run() 回傳 (winner, rounds, sums)：
+      winner (N,)  1 = A 勝、2 = B 勝、0 = 平手或超過 max_rounds
+      rounds (N,)  進行的輪數
+      sums (N, 2, len(FIELDS))  兩隊的貢獻統計（欄位同 battle.sim.FIELDS）
+
+    狀態一律攤平成一維「格」：第 b 條車道的第 u 個單位 = 格 b * n_units + u，
+    這樣每次取值 / 寫回都只是一維索引（比多維花式索引快數倍）。
+
+    Buff 不逐回合倒數，而是放進「到期時間輪」：每格有一個「回合結束次數」時鐘，
+    Buff 依到期時鐘值 (存入時的時鐘 + duration) mod W 放進對應的桶，
+    回合結束時只需清空「這個時鐘值」的那一桶。結果與 trigger_phase(END) + buff_end_round
+    的逐回合倒數相同（END 與 APPLY 階段的 Buff 都在持有者自己的回合結束時扣 1）。
+    """
+
+    def __init__(self, team_a, team_b, n, *, seed=0, profile=None, max_rounds=5000,
+                 lanes=4096, slots=8):
+        if profile is None:
+            from battle.ai_controller import AIController
+            profile = AIController.load_profile("Default")
+        c = self.c = _Compiled(team_a, team_b, profile)
+        self.battles = n
+        self.n = n = max(1, min(n, lanes))
+        cells = n * c.n_units
+        self.max_rounds = max_rounds
+        self.rng = np.random.default_rng(seed)
+
+        self.hp = np.tile(c.hp0, n)
+        self.shield = np.tile(c.shield0, n)
+        self.max_hp = np.tile(c.max_hp, n)
+        self.stat = np.tile(c.stat0.T, (1, n))          # (len(COLS), 格)
+        self.max_stat = np.tile(c.max_stat.T, (1, n))
+        # 屬性 Buff 的加值合計；stat = max(下限, max_stat + mod)（同 Character.add_modifier）
+        self.mod = np.zeros_like(self.stat)
+        self.cd = np.zeros((cells, max(1, c.max_skills)), dtype=np.int32)
+        # Buff 槽位 (桶, 槽位, 格)：模板編號（-1 = 空）、已套用數值（回退用）
+        # 格放在最內層：同一 (桶, 槽位) 內每格最多一個 Buff，可整列向量化處理
+        # used 是每桶佔用槽位的位元遮罩（找空槽不必掃描）
+        self.b_tpl = np.full((c.wheel, slots, cells), -1, dtype=np.int16)
+        self.b_val = np.zeros((c.wheel, slots, cells))
+        self.used = np.zeros((c.wheel, cells), dtype=np.uint64)
+        self.top = 1
+        self.clock = np.zeros(cells, dtype=np.int32)
+        # 身上掛著的 TAUNT / INVINCIBLE 數量（避免每次掃描槽位）
+        self.taunt = np.zeros(cells, dtype=np.int32)
+        self.inv = np.zeros(cells, dtype=np.int32)
+        self.sums = np.zeros((n, 2, len(FIELDS)))
+
+    def _grid(self, arr, bi):
+        """把一維的格陣列取成 (len(bi), n_units)"""
+        return arr.reshape(self.n, self.c.n_units)[bi]
+
+    # ---------- 查詢 ----------
+    def _team_alive(self, side, idx):
+        return (self._grid(self.hp, idx)[:, self.c.side == side] > 0).any(axis=1)
+
+    # 單位數很少（每隊 4 人），沿單位軸的 min / cumsum 改成逐欄迴圈，
+    # 每一步都是整條場次軸的一維運算，比 axis=1 的縮減快得多
+    def _pick(self, masks):
+        """masks = [(單位, 該單位是否候選)]；每場在候選中均勻抽一個，沒有候選回傳 -1"""
+        cnt = sum(m.astype(np.int64) for _, m in masks)
+        k = (self.rng.random(len(cnt)) * cnt).astype(np.int64)
+        out = np.full(len(cnt), -1)
+        seen = np.zeros(len(cnt), dtype=np.int64)
+        for v, m in masks:
+            out[m & (seen == k)] = v
+            seen += m
+        return out
+
+    def _rule(self, rule, bi, u, masks):
+        # 與 TargetStrategy 相同：sorted() 取第一個，平手時取隊伍順序較前者
+        if rule == "SELF":
+            return np.full(len(bi), u)
+        if rule not in _RULES or rule == "RANDOM":
+            return self._pick(masks)
+        best = np.full(len(bi), np.inf)
+        out = np.full(len(bi), -1)
+        for v, m in masks:
+            f = bi * self.c.n_units + v
+            if rule == "LOW_HP":
+                key = self.hp[f] / max(1.0, self.c.max_hp[v])
+            elif rule == "HIGH_HP":
+                key = -self.hp[f]
+            elif rule == "WEAKEST_DEF":
+                key = self.stat[PDEF][f] + self.stat[MDEF][f]
+            else:  # HIGHEST_ATK
+                key = -(self.stat[PATK][f] + self.stat[MATK][f])
+            better = m & (key < best)
+            best = np.where(better, key, best)
+            out[better] = v
+        return out
+
+    # ---------- 數值結算 ----------
+    def _take(self, f, dmg):
+        """Character.take_damage：無敵 → 護盾 → 四捨五入扣血"""
+        dmg = np.where(self.inv[f] > 0, 0.0, np.maximum(0.0, dmg))
+        sh = self.shield[f]
+        absorbed = np.minimum(dmg, sh)
+        self.shield[f] = sh - absorbed
+        dmg -= absorbed
+        hp = self.hp[f]
+        self.hp[f] = np.where(dmg > 0, np.maximum(0.0, hp - np.rint(dmg)), hp)
+
+    def _attack(self, tpl, u, bi, ft, repeated):
+        c = self.c
+        atk, dfn = (PATK, PDEF) if c.eff[tpl] == Effect.PHYSICDAMAGE else (MATK, MDEF)
+        fs = bi * c.n_units + u
+        st = self.stat
+        evade = np.clip(np.clip(st[MISS][ft], 0, 1) - np.clip(st[HIT][fs], 0, 1), 0.0, 0.95)
+        roll = self.rng.random((2, len(bi)))
+        hit = roll[0] >= evade
+        dmg = np.maximum(0.0, np.maximum(0.0, st[atk][fs]) * c.pct_of[tpl] + c.base_of[tpl]
+                         - np.maximum(0.0, st[dfn][ft]))
+        crit = roll[1] < np.clip(st[CRI][fs], 0, 1)
+        dmg = np.where(crit, dmg * np.maximum(1.0, st[CRIDMG][fs]), dmg)
+
+        bi, ft, dmg = bi[hit], ft[hit], dmg[hit]
+        before = self.hp[ft]
+        self._take(ft, dmg)
+        dealt = np.maximum(0.0, np.trunc(before - self.hp[ft]))
+        self._tally(bi, c.side[u], 0, dealt, repeated)
+        self._tally(bi, 1 - c.side[u], 1, dealt, repeated)
+
+    def _tally(self, bi, side, field, weights=None, repeated=False):
+        """依場次累加貢獻統計；repeated=True 表示同一場可能出現多次（群體目標）"""
+        if repeated:
+            self.sums[:, side, field] += np.bincount(bi, weights, minlength=self.n)
+        else:
+            self.sums[bi, side, field] += 1 if weights is None else weights
+
+    def _heal(self, f, delta):
+        """Character.add_hp：正值回血（上限 max_hp），負值先扣護盾"""
+        hp, sh = self.hp[f], self.shield[f]
+        up = np.minimum(hp + delta, self.max_hp[f])
+        dmg = np.maximum(0.0, -delta)
+        absorbed = np.minimum(dmg, sh)
+        self.hp[f] = np.where(delta >= 0, up, np.maximum(0.0, hp - (dmg - absorbed)))
+        self.shield[f] = np.where(delta >= 0, sh, sh - absorbed)
+
+    def _tick(self, tpl, f):
+        """DOT / ADDHP 的單次結算；tpl 可逐格不同"""
+        c = self.c
+        amount = self.max_hp[f] * c.pct_of[tpl] + c.base_of[tpl]
+        dot = c.is_dot[tpl]
+        if dot.any():
+            self._take(f[dot], np.maximum(0.0, amount[dot]))
+        heal = c.is_heal[tpl]
+        if heal.any():
+            self._heal(f[heal], amount[heal])
+
+    def _apply(self, tpl, u, bi, f, repeated):
+        """EffectRegistry.apply 的向量版本；回傳要記入槽位的 applied 數值"""
+        c = self.c
+        eff = c.eff[tpl]
+        if eff in (Effect.PHYSICDAMAGE, Effect.MAGICDAMAGE):
+            self._attack(tpl, u, bi, f, repeated)
+        elif eff in _TICKABLE:
+            self._tick(np.full(len(f), tpl), f)
+        elif eff == Effect.ADDSHIELD:
+            before = self.shield[f]
+            after = np.maximum(0.0, before + self.max_hp[f] * c.pct_of[tpl] + c.base_of[tpl])
+            self.shield[f] = after
+            return after - before
+        elif eff in _STAT_EFFECTS:
+            col, floor = _STAT_EFFECTS[eff]
+            add = self.max_stat[col][f] * c.pct_of[tpl] + c.base_of[tpl]
+            mod = self.mod[col]
+            mod[f] += add
+            self.stat[col][f] = np.maximum(floor, self.max_stat[col][f] + mod[f])
+            return add
+        # TAUNT / INVINCIBLE：只要掛在槽位上就生效
+        return 0.0
+
+    def _store(self, tpl, f, val):
+        """放進到期桶中最前面的空槽；f 兩兩不重複"""
+        c = self.c
+        cells = len(self.hp)
+        bucket = (self.clock[f] + c.life_of[tpl]) % c.wheel
+        key = bucket * cells + f
+        used = self.used.reshape(-1)[key]
+        low = ~used & (used + np.uint64(1))  # 最低的 0 位元
+        if not low.all():
+            raise RuntimeError("單位身上同時到期的 Buff 超過 64 個")
+        self.used.reshape(-1)[key] = used | low
+        s = np.log2(low.astype(np.float64)).astype(np.intp)
+        top = int(s.max()) + 1
+        if top > self.top:
+            while top > self.b_tpl.shape[1]:
+                self._grow()
+            self.top = top
+        flat = (bucket * self.b_tpl.shape[1] + s) * cells + f
+        self.b_tpl.reshape(-1)[flat] = tpl
+        if c.reverts[tpl]:
+            self.b_val.reshape(-1)[flat] = val
+        if c.is_taunt[tpl]:
+            self.taunt[f] += 1
+        elif c.is_inv[tpl]:
+            self.inv[f] += 1
+
+    def _grow(self):
+        pad = ((0, 0), (0, self.b_tpl.shape[1]), (0, 0))
+        self.b_tpl = np.pad(self.b_tpl, pad, constant_values=-1)
+        self.b_val = np.pad(self.b_val, pad)
+
+    def _receive(self, tpl, u, bi, f, repeated):
+        """Character.receive_buff"""
+        c = self.c
+        self._tally(bi, c.side[u], 3, None, repeated)
+        if c.phase_of[tpl] == Phase.APPLY.value:
+            val = self._apply(tpl, u, bi, f, repeated)
+            if c.dur_of[tpl] != 0:
+                self._store(tpl, f, val)
+        else:
+            self._store(tpl, f, 0.0)
+
+    def _expire(self, f, tpl, val):
+        """EffectRegistry.remove：回退屬性 / 護盾（f 兩兩不重複）"""
+        c = self.c
+        for table, count in ((c.is_taunt, self.taunt), (c.is_inv, self.inv)):
+            hit = table[tpl]
+            if hit.any():
+                count[f[hit]] -= 1
+        col = c.col_of[tpl]
+        st = col >= 0
+        if st.any():
+            flat = col[st] * len(self.hp) + f[st]
+            mod = self.mod.reshape(-1)
+            mod[flat] -= val[st]
+            self.stat.reshape(-1)[flat] = np.maximum(c.floor_of[tpl[st]],
+                                                     self.max_stat.reshape(-1)[flat] + mod[flat])
+        sh = c.is_shield[tpl]
+        if sh.any():
+            g = f[sh]
+            self.shield[g] = np.maximum(0.0, self.shield[g] - val[sh])
+
+    def _end_turn(self, f):
+        """Character.trigger_phase(END) + buff_end_round()"""
+        c = self.c
+        cells = len(self.hp)
+        if c.has_end:
+            # END 階段效果依槽位順序逐一結算（扣血有四捨五入，不能合併）
+            tpl = self.b_tpl[:, :self.top, f].reshape(-1, len(f))
+            due = c.phase_of[tpl] == Phase.END.value
+            for s in np.nonzero(due.any(axis=1))[0]:
+                rows = due[s]
+                self._tick(tpl[s, rows], f[rows])
+
+        clock = self.clock[f] + 1
+        self.clock[f] = clock
+        key = (clock % c.wheel) * cells + f
+        used = self.used.reshape(-1)[key]
+        hit = used != 0
+        if not hit.any():
+            return
+        f, key, used = f[hit], key[hit], used[hit]
+        self.used.reshape(-1)[key] = 0
+        # 這一桶的 Buff 全部到期；依槽位順序逐一回退（同一格多個 Buff 時每次都夾在下限上）
+        tpl_flat = self.b_tpl.reshape(-1)
+        slots = self.b_tpl.shape[1]
+        base = (key // cells) * slots * cells + f
+        for s in range(int(used.max()).bit_length()):
+            flat = base + s * cells
+            tpl = tpl_flat[flat]
+            live = tpl >= 0
+            if not live.any():
+                continue
+            flat = flat[live]
+            self._expire(f[live], tpl[live], self.b_val.reshape(-1)[flat])
+            tpl_flat[flat] = -1
+
+    # ---------- AI ----------
+    def _choose_skill(self, u, act, f):
+        """AIController.choose_skill：分數排序後在前兩名中隨機；無可用技能回傳 -1"""
+        c = self.c
+        k = len(c.skills[u])
+        if k == 0:
+            return np.full(len(act), -1)
+        m = len(act)
+        heal = guard = 0.0
+        if c.n_heal[u].any():
+            lowest = np.full(m, np.inf)
+            for v in np.nonzero(c.side == c.side[u])[0]:
+                hp = self.hp[act * c.n_units + v]
+                lowest = np.where(hp > 0, np.minimum(lowest, hp / max(1.0, c.max_hp[v])), lowest)
+            heal = np.where(lowest < 0.3, 50.0, np.where(lowest < 0.6, 20.0, -10.0))
+        if c.n_guard[u].any():
+            guard = np.where(self.hp[f] / max(1.0, c.max_hp[u]) < 0.4, 25.0, 0.0)
+
+        # 依分數由高到低、同分取技能順序較前者（sorted 的穩定排序），只需要前兩名
+        cd = self.cd[f]
+        first = np.full(m, -1)
+        second = np.full(m, -1)
+        s1 = np.full(m, -np.inf)
+        s2 = np.full(m, -np.inf)
+        for j in range(k):
+            usable = cd[:, j] == 0
+            score = c.score_base[u][j] + c.n_heal[u][j] * heal + c.n_guard[u][j] * guard
+            top = usable & ((first < 0) | (score > s1))
+            nxt = usable & ~top & ((second < 0) | (score > s2))
+            second = np.where(top, first, np.where(nxt, j, second))
+            s2 = np.where(top, s1, np.where(nxt, score, s2))
+            first = np.where(top, j, first)
+            s1 = np.where(top, score, s1)
+        pick2 = (second >= 0) & (self.rng.random(m) < 0.5)
+        return np.where(pick2, second, first)
+
+    def _targets(self, tpl, u, bi):
+        """AIController.choose_target；回傳 (場次, 目標單位) 兩個等長陣列"""
+        c = self.c
+        kind = c.target[tpl]
+        if kind == Target.SELF:
+            return bi, np.full(len(bi), u)
+        mine = c.side == c.side[u]
+        if kind in (Target.TEAM, Target.ENEMIES):
+            group = np.nonzero(mine if kind == Target.TEAM else ~mine)[0]
+            return np.repeat(bi, len(group)), np.tile(group, len(bi))
+
+        group = np.nonzero(mine if kind == Target.ALLY else ~mine)[0]
+        cells = [bi * c.n_units + v for v in group]
+        masks = [(v, self.hp[f] > 0) for v, f in zip(group, cells)]
+        if kind == Target.ALLY:
+            ti = self._rule(c.rule_ally, bi, u, masks)
+        else:
+            ti = self._rule(c.rule_enemy, bi, u, masks)
+            # 嘲諷優先
+            taunted = [(v, m & (self.taunt[f] > 0)) for (v, m), f in zip(masks, cells)]
+            forced = np.logical_or.reduce([m for _, m in taunted])
+            if forced.any():
+                ti[forced] = self._pick([(v, m[forced]) for v, m in taunted])
+        ok = ti >= 0
+        return bi[ok], ti[ok]
+
+    # ---------- 回合 ----------
+    def _turn(self, u, act):
+        c = self.c
+        f = act * c.n_units + u
+        # trigger_phase(START)：資料中沒有 START 階段 Buff，且到期一律在回合結束處理
+        choice = self._choose_skill(u, act, f)
+        for k, (cd, tpls) in enumerate(c.skills[u]):
+            sel = choice == k
+            if not sel.any():
+                continue
+            bi = act[sel]
+            self.cd[f[sel], k] = cd
+            for tpl in tpls:
+                b, ti = self._targets(tpl, u, bi)
+                ft = b * c.n_units + ti
+                alive = self.hp[ft] > 0
+                if alive.any():
+                    repeated = c.target[tpl] in (Target.TEAM, Target.ENEMIES)
+                    self._receive(tpl, u, b[alive], ft[alive], repeated)
+            if c.heal_done[u][k]:
+                self.sums[bi, c.side[u], 2] += c.heal_done[u][k]
+
+        self._end_turn(f)
+        self.cd[f] = np.maximum(0, self.cd[f] - 1)
+
+    def _reset(self, lanes):
+        """把車道恢復成開戰狀態"""
+        c = self.c
+        f = (lanes[:, None] * c.n_units + np.arange(c.n_units)).ravel()
+        self.hp[f] = np.tile(c.hp0, len(lanes))
+        self.shield[f] = np.tile(c.shield0, len(lanes))
+        self.stat[:, f] = np.tile(c.stat0.T, (1, len(lanes)))
+        self.mod[:, f] = 0.0
+        self.cd[f] = 0
+        self.b_tpl[:, :, f] = -1
+        self.used[:, f] = 0
+        self.clock[f] = 0
+        self.taunt[f] = 0
+        self.inv[f] = 0
+        self.sums[lanes] = 0.0
+
+    def run(self):
+        c = self.c
+        total = self.battles
+        winner = np.zeros(total, dtype=np.int8)
+        rounds = np.zeros(total, dtype=np.int32)
+        sums = np.zeros((total, 2, len(FIELDS)))
+
+        order = (np.arange(c.size_a), np.arange(c.size_a, c.n_units))
+        battle = np.arange(self.n)               # 每條車道目前是第幾場
+        started = self.n
+        lane_rounds = np.zeros(self.n, dtype=np.int32)
+        ongoing = np.ones(self.n, dtype=bool)
+        while ongoing.any():
+            idx = np.nonzero(ongoing)[0]
+            # 與 BattleManager.battle 相同：A 隊依序行動、對手全滅就中斷，再換 B 隊
+            for side, members in enumerate(order):
+                broke = np.zeros(len(idx), dtype=bool)
+                for u in members:
+                    act = idx[~broke & (self.hp[idx * c.n_units + u] > 0)]
+                    if len(act):
+                        self._turn(u, act)
+                        broke |= ~self._team_alive(1 - side, idx)
+            lane_rounds[idx] += 1
+
+            a, b = self._team_alive(0, idx), self._team_alive(1, idx)
+            over = ~(a & b) | (lane_rounds[idx] >= self.max_rounds)
+            if not over.any():
+                continue
+            done, a, b = idx[over], a[over], b[over]
+            ids = battle[done]
+            # 超過 max_rounds 仍未分出勝負視為平手
+            winner[ids] = np.where(a & ~b, 1, np.where(b & ~a, 2, 0))
+            rounds[ids] = lane_rounds[done]
+            sums[ids] = self.sums[done]
+            ongoing[done] = False
+
+            refill = done[:max(0, total - started)]
+            if len(refill):
+                self._reset(refill)
+                battle[refill] = np.arange(started, started + len(refill))
+                started += len(refill)
+                lane_rounds[refill] = 0
+                ongoing[refill] = True
+        return winner, rounds, sums
+
+
+def run_pair(job_a, job_b, battles, *, level_a=1, level_b=1, seed=0, team_size=4,
+             max_rounds=5000, profile=None) -> PairStats:
+    """以向量化核心跑 battles 場 job_a vs job_b，回傳與 battle.sim 相同格式的 PairStats"""
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        team_a = _build_team(job_a, level_a, team_size)
+        team_b = _build_team(job_b, level_b, team_size)
+    kernel = MonteCarloKernel(team_a, team_b, battles, seed=seed,
+                              profile=profile, max_rounds=max_rounds)
+    winner, _, sums = kernel.run()
+    total = sums.sum(axis=0)
+    return PairStats(job_a, job_b, battles,
+                     int((winner == 1).sum()), int((winner == 2).sum()),
+                     tuple(float(x) for x in total[0]), tuple(float(x) for x in total[1]))
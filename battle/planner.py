@@ -0,0 +1,217 @@
+# battle/planner.py
+# 搜尋型 AI：ai_profiles.json 的設定加上 "planner": "mcts" 即改用蒙地卡羅樹搜尋選 (技能, 目標)。
+#
+# - 決策點存一份 Checkpoint（battle/checkpoint.py）；每棵樹一組複本（自有匯流排與亂數流），
+#   每次模擬前清空該匯流排並從存檔點還原，真正的戰鬥與 UI 不受影響（模擬期間本執行緒的紀錄靜音）
+# - 根節點的每個 (技能, 目標) 以 UCB1 分配模擬次數；一次模擬 = 先執行該行動，
+#   之後雙方依一般 AIController 規則行動 depth 個回合，以勝負 / 剩餘血量比例評分
+# - 每次決策固定跑 rollouts 次模擬，種子取自戰鬥的亂數流：同一個 seed 必定做出同樣的選擇
+#   （無頭模擬、rewind / 劇情重試都能重現）。budget_ms 只是 realtime（GUI）時的牆鐘安全上限，
+#   在模擬回合之間檢查；觸發時該次決策不保證可重現，設定時應大於平常跑完 rollouts 的時間
+# - workers > 1 時在執行緒池上平行跑多棵樹（root parallelization），最後合併各行動次數
+import copy
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from battle.ai_controller import AIController
+from battle.battle_log import muted
+from battle.battle_manager import BattleManager
+from battle.buff import Target, BuffStore
+from battle.checkpoint import capture, restore
+from battle.event_manager import EventManager
+from battle.rng import unit_rng
+from character.character import Character
+
+_pools = {}  # 執行緒數 → ThreadPoolExecutor（整個程式共用）
+
+
+def _pool(n):
+    pool = _pools.get(n)
+    if pool is None:
+        pool = _pools[n] = ThreadPoolExecutor(max_workers=n, thread_name_prefix="mcts")
+    return pool
+
+
+# ---------- 戰況複製 ----------
+def _skeleton(c):
+    """同構的空角色：只帶建立後不變的欄位，其餘由 checkpoint.restore 寫入"""
+    n = Character.__new__(Character)
+    n.name, n.job, n.stats, n._job_growth = c.name, c.job, c.stats, c._job_growth
+    n.skills = []
+    n.buffs = BuffStore()
+    n.rng = None
+    # 模擬時由 planner 指派控制器；印記由 restore 寫入
+    n.__dict__.update((k, v) for k, v in c.__dict__.items() if k not in ("controller", "_marks"))
+    return n
+
+
+def clone_battle(allies, enemies, rng, cp=None):
+    """
+    複製雙方隊伍到新的匯流排：回傳 (我方複本, 敵方複本, 原角色 → 複本)。
+    cp 為同一組角色的 Checkpoint（省略時當場存一份）；複本共用 rng。
+    """
+    units = list(allies) + list(enemies)
+    if cp is None:
+        cp = capture(units)
+    clones = [_skeleton(c) for c in units]
+    for n in clones:
+        n.rng = rng
+    restore(cp, clones, bus=EventManager())
+    k = len(allies)
+    return clones[:k], clones[k:], dict(zip(units, clones))
+
+
+# ---------- 模擬 ----------
+def _alive(team):
+    return any(not u.is_dead() for u in team)
+
+
+def _value(allies, enemies):
+    """我方觀點的評分（0~1）：全滅 / 勝利為 0 / 1，否則依雙方剩餘血量比例"""
+    if not _alive(enemies):
+        return 1.0
+    if not _alive(allies):
+        return 0.0
+    fa = sum(max(0, u.hp) for u in allies) / max(1, sum(u.max_hp for u in allies))
+    fe = sum(max(0, u.hp) for u in enemies) / max(1, sum(u.max_hp for u in enemies))
+    return 0.5 + 0.5 * (fa - fe)
+
+
+def _actions(actor, allies, enemies):
+    """可選的 (技能編號, 目標種類, 目標編號)；技能的第一個單體 Buff 決定目標"""
+    out = []
+    for si, sk in enumerate(actor.skills):
+        if sk.cdtime != 0:
+            continue
+        kind = next((b.target for b in sk.buffs if b.target in (Target.ALLY, Target.ENEMY)), None)
+        if kind is None:
+            out.append((si, None, None))
+            continue
+        group = allies if kind is Target.ALLY else enemies
+        out.extend((si, kind, ti) for ti, u in enumerate(group) if not u.is_dead())
+    return out
+
+
+class MCTSPlanner:
+    """
+    rollouts：每次決策的模擬次數（決定搜尋量）；depth：每次模擬在行動後再走幾個單位回合；
+    explore：UCB1 探索係數；workers：> 1 時平行跑的樹數（執行緒池）；
+    budget_ms：realtime 時的牆鐘安全上限（None = 不設）；
+    realtime：由呼叫端決定（GUI 為 True），不是設定檔選項
+    """
+    def __init__(self, budget_ms=None, rollouts=300, depth=8, explore=1.0, workers=0, realtime=False):
+        self.budget = max(1, budget_ms) / 1000.0 if budget_ms else None
+        self.realtime = bool(realtime)
+        self.rollouts = max(1, int(rollouts))
+        self.depth = max(0, int(depth))
+        self.explore = float(explore)
+        self.workers = max(0, int(workers))
+
+    @staticmethod
+    def _controllers(units):
+        """
+        模擬用的一般規則控制器（沿用各單位的設定）：每棵樹各一組、不跨執行緒共用；
+        在呼叫端執行緒建立，執行緒池上不讀設定表。模擬中一律用一般規則，不再遞迴搜尋。
+        """
+        by_name, out = {}, {}
+        for u in units:
+            ctrl = getattr(u, "controller", None)
+            if not isinstance(ctrl, AIController):
+                ctrl = None
+            name = ctrl.ai_profile.name if ctrl else "Default"
+            ai = by_name.get(name)
+            if ai is None:
+                ai = by_name[name] = (ctrl or AIController()).rules_only()
+            out[u] = ai
+        return out
+
+    def choose(self, actor, allies, enemies):
+        """回傳 (技能編號, {目標種類: 目標})；沒有可用技能時回傳 None"""
+        actions = _actions(actor, allies, enemies)
+        if not actions:
+            return None
+        if len(actions) > 1:
+            seed = unit_rng(actor).getrandbits(64)
+            # 只有 realtime 才看時鐘；否則模擬次數是唯一的上限（可重現）
+            deadline = time.perf_counter() + self.budget if self.realtime and self.budget else math.inf
+            cp = capture(chain(allies, enemies))  # 各棵樹共用；之後不再讀真正的角色
+            args = (actor, allies, enemies, actions, cp, deadline)
+            trees = max(1, self.workers)
+            per_tree = -(-self.rollouts // trees)
+            ctrls = [self._controllers(chain(allies, enemies)) for _ in range(trees)]
+            futures = [_pool(trees - 1).submit(self._search, *args, ctrls[k], seed + k, per_tree)
+                       for k in range(1, trees)]
+            n, w = self._search(*args, ctrls[0], seed, per_tree)
+            for f in futures:
+                fn, fw = f.result()
+                n = [a + b for a, b in zip(n, fn)]
+                w = [a + b for a, b in zip(w, fw)]
+            best = max(range(len(actions)), key=lambda i: (n[i], w[i] / max(1, n[i])))
+        else:
+            best = 0
+        si, kind, ti = actions[best]
+        plan = {}
+        if kind is not None:
+            plan[kind] = (allies if kind is Target.ALLY else enemies)[ti]
+        return si, plan
+
+    def _search(self, actor, allies, enemies, actions, cp, deadline, ctrls, seed, limit):
+        rng = random.Random(seed)
+        # 每棵樹一組複本：每次模擬前從存檔點還原（不必重建角色）
+        sim_rng = random.Random()
+        a, e, umap = clone_battle(allies, enemies, sim_rng, cp)
+        for orig, u in umap.items():
+            u.controller = ctrls[orig]
+        # 匯流排與 BattleManager 也是每棵樹一份：每次模擬前清空訂閱再還原
+        bus = a[0].events
+        bm = BattleManager(controller=ctrls[actor], events=bus, seed=0, rng=sim_rng)
+        sim = (a, e, umap[actor], ctrls[actor], sim_rng, bus, bm)
+        k = len(actions)
+        n, w = [0] * k, [0.0] * k
+        total = 0
+        c = self.explore
+        while total < limit and time.perf_counter() < deadline:
+            if total < k:
+                i = total  # 每個行動先各試一次
+            else:
+                log_t = math.log(total)
+                i = max(range(k), key=lambda j: w[j] / n[j] + c * math.sqrt(log_t / n[j]))
+            w[i] += self._rollout(sim, cp, actions[i], rng, deadline)
+            n[i] += 1
+            total += 1
+        return n, w
+
+    def _rollout(self, sim, cp, action, rng, deadline):
+        a, e, me, ctrl, sim_rng, bus, bm = sim
+        with muted():
+            bus.clear()
+            restore(cp, a + e, bus=bus)
+            sim_rng.seed(rng.getrandbits(64))
+
+            # 1) 執行候選行動（決策點已過回合開始與行動判定，直接從技能結算接續）
+            si, kind, ti = action
+            plan = {}
+            if kind is not None:
+                plan[kind] = (a if kind is Target.ALLY else e)[ti]
+            scripted = copy.copy(ctrl)  # 單體目標照搜尋指定，其餘照一般規則
+            scripted._snap, scripted._plan = None, (me, plan)
+            bm.cast(me, a, e, scripted, me.skills[si].be_used())
+
+            # 2) 之後依回合順序：我方行動者之後的隊友 → 敵方全體 → 我方全體 → …
+            team = {u: (a, e) for u in a}
+            team.update({u: (e, a) for u in e})
+            k = a.index(me)
+            order = chain(a[k + 1:], chain.from_iterable(iter(lambda: e + a, None)))
+            steps = 0
+            for u in order:
+                if steps >= self.depth or not _alive(a) or not _alive(e) \
+                        or time.perf_counter() >= deadline:
+                    break
+                if u.is_dead():
+                    continue
+                bm.turn(u, *team[u])
+                steps += 1
+            return _value(a, e)
@@ -0,0 +1,70 @@
+# battle/profile_library.py
+import json
+import os
+import threading
+from battle.buff import Effect
+
+_DEFAULT = {"skill_priority": {}, "target_rule": "RANDOM"}
+
+
+class AIProfile:
+    """預先解析好的 AI 設定：效果 → 權重（未列出的效果為 1）與目標規則"""
+    __slots__ = ("name", "data", "weights", "rule_ally", "rule_enemy", "planner", "planner_options")
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data  # 原始 JSON 內容（唯讀使用）
+        prio = data.get("skill_priority", {})
+        self.weights = {e: prio.get(e.name, 1) for e in Effect}
+        self.rule_ally = data.get("target_rule_ally", "LOW_HP")
+        self.rule_enemy = data.get("target_rule_enemy", data.get("target_rule", "RANDOM"))
+        self.planner = data.get("planner")  # None = 一般規則；"mcts" = 搜尋（battle/planner.py）
+        # mcts：rollouts / depth / explore / workers 決定搜尋（同 seed 可重現）；
+        # budget_ms 只在 GUI（realtime）戰鬥時當牆鐘安全上限
+        self.planner_options = data.get("planner_options", {})
+
+
+class ProfileLibrary:
+    """
+    AI 設定表：整個程式共用一份，檔案只在修改時間變了才重新解析。
+    路徑相對於本檔案所在目錄（battle），與工作目錄無關。
+    get() 加鎖：重新載入與查表不會在多個執行緒間交錯（搜尋型 AI 可能在執行緒池上建控制器）。
+    """
+    profiles = {}   # 名稱 → AIProfile
+    _raw = {}
+    _mtime = None   # None = 尚未載入；-1 = 檔案不存在
+    path = os.path.join(os.path.dirname(__file__), "ai_profiles.json")
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _refresh():
+        try:
+            mtime = os.stat(ProfileLibrary.path).st_mtime_ns
+        except OSError:
+            mtime = -1
+        if mtime == ProfileLibrary._mtime:
+            return
+        raw = {}
+        if mtime != -1:
+            with open(ProfileLibrary.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        ProfileLibrary._raw = raw
+        ProfileLibrary.profiles = {}
+        ProfileLibrary._mtime = mtime
+
+    @staticmethod
+    def get(name) -> AIProfile:
+        with ProfileLibrary._lock:
+            ProfileLibrary._refresh()
+            prof = ProfileLibrary.profiles.get(name)
+            if prof is None:
+                raw = ProfileLibrary._raw
+                # 取得設定，如果找不到則使用 Default；檔案不存在時用預設值，防止崩潰
+                data = raw.get(name)
+                if data is None:  # enemies.json 的 feature 為大寫（TANK / DPS …），不分大小寫比對
+                    key = str(name).upper()
+                    data = next((v for k, v in raw.items() if k.upper() == key), None)
+                if data is None:
+                    data = raw.get("Default", {}) if raw else _DEFAULT
+                prof = ProfileLibrary.profiles[name] = AIProfile(name, data)
+            return prof
@@ -0,0 +1,384 @@
+# battle/recorder.py
+# 二進位戰鬥錄影：掛在戰鬥匯流排上，把每個事件寫成固定長度的紀錄；
+# 重播時直接從紀錄驅動 UI / 統計，不再跑 AI 與傷害計算。
+#
+# 檔案格式：b"BREC" + <H 版本><I 標頭長度> + 標頭(JSON) + N 筆紀錄(_REC)
+#   標頭：種子、雙方單位（名稱 / 職業 / 陣營 / 等級 / 初始數值 / 技能與其 Buff）
+#   紀錄：kind, flags, actor, target, skill, aux, turn, a, b
+#         actor / target 為標頭 units 的索引（-1 = 無）；skill / aux 為技能與 Buff 索引
+#
+# 用法：
+#   rec = BattleRecorder(bm, team_a, team_b)   # 必須在 bm.battle() 之前建立
+#   bm.battle(team_a, team_b)
+#   rec.finish(); rec.save("battle.brec")
+#   python -m battle.recorder battle.brec [--stats]
+import argparse
+import gzip
+import json
+import random
+import struct
+import sys
+from collections import namedtuple
+from enum import IntEnum
+
+from battle.buff import Effect
+from battle.event_manager import EventType
+
+MAGIC = b"BREC"
+VERSION = 2
+_HEAD = struct.Struct("<HI")
+# 版本 → 紀錄格式；v2 起 actor / target 為 int16（v1 為 int8，超過 127 個單位會溢位）
+_RECS = {1: struct.Struct("<BBbbhhIdd"), 2: struct.Struct("<BBhhhhIdd")}
+_REC = _RECS[VERSION]  # 30 bytes
+
+
+class Rec(IntEnum):
+    TURN = 1      # actor 的回合開始
+    CAST = 2      # actor 施放 skill
+    HIT = 3       # actor 攻擊 target，a = 實際傷害；flags: CRIT / MISS
+    DAMAGE = 4    # target 承受傷害（含 DOT），a = 實際扣血；flags: ATTACK
+    STATE = 5     # target 的 a = hp、b = 護盾
+    BUFF = 6      # actor 對 target 套上 skill 的第 aux 個 Buff
+    REMOVE = 7    # target 身上來自 actor 的 Buff 結束
+    RESOLVE = 8   # actor 的技能結算完畢
+    DRAW = 9      # 亂數：a = 取值；flags: BITS 時 aux = 位元數
+    END = 10      # 戰鬥結束；flags = 勝方（1 = A、2 = B、0 = 同歸於盡）
+
+
+CRIT, MISS, ATTACK, BITS = 1, 2, 4, 8
+
+Record = namedtuple("Record", "kind flags actor target skill aux turn a b")
+
+
+class _TapRandom(random.Random):
+    """從原本的亂數流接手（狀態相同），每次取值順便寫一筆 DRAW"""
+
+    def __init__(self, rng, sink):
+        super().__init__()
+        self.setstate(rng.getstate())
+        self._sink = sink
+
+    def random(self):
+        x = super().random()
+        self._sink(0, 0, x)
+        return x
+
+    # 一併覆寫 getrandbits，choice()/randrange() 才會沿用與原本相同的取值方式
+    def getrandbits(self, k):
+        x = super().getrandbits(k)
+        self._sink(BITS, k, float(x))
+        return x
+
+
+def _buff_row(b):
+    return [b.name, b.effect.name, b.duration, float(b.percent), float(b.base)]
+
+
+class BattleRecorder:
+    """監聽 bm.events，把整場戰鬥寫進 bytearray；draws=False 時不記錄亂數"""
+
+    def __init__(self, bm, team_a, team_b, *, draws=True):
+        self.bm = bm
+        self.units = list(team_a) + list(team_b)
+        self.index = {u: i for i, u in enumerate(self.units)}
+        self.header = {
+            "version": VERSION,
+            "seed": getattr(bm, "seed", None),
+            "units": [{
+                "name": u.name, "job": u.job, "side": 0 if i < len(team_a) else 1,
+                "lv": getattr(u, "lv", 1), "max_hp": float(u.max_hp),
+                "hp": float(u.hp), "shield": float(getattr(u, "shield", 0.0)),
+                "skills": [{"name": s.name, "buffs": [_buff_row(b) for b in s.buffs]}
+                           for s in u.skills],
+            } for i, u in enumerate(self.units)],
+        }
+        self.buf = bytearray()
+        self.turn = 0
+        self._last = [(u.hp, getattr(u, "shield", 0.0)) for u in self.units]
+        self._refs = {}        # (施放者索引, Buff 模板) → (技能索引, Buff 索引)
+        self._attacking = False
+        self._done = False
+        if draws:
+            bm.rng = _TapRandom(bm.rng, self._draw)
+        self._bind()
+
+    # --- 寫入 ---
+    def _put(self, kind, flags=0, actor=-1, target=-1, skill=-1, aux=-1, a=0.0, b=0.0):
+        self.buf += _REC.pack(kind, flags, actor, target, skill, aux, self.turn, a, b)
+
+    def _draw(self, flags, aux, x):
+        self._put(Rec.DRAW, flags, aux=aux, a=x)
+
+    def _idx(self, unit):
+        return self.index.get(unit, -1)
+
+    def _sync(self, units=None):
+        # 只寫出 hp / 護盾有變動的單位
+        for i in (range(len(self.units)) if units is None else units):
+            u = self.units[i]
+            now = (u.hp, getattr(u, "shield", 0.0))
+            if now != self._last[i]:
+                self._last[i] = now
+                self._put(Rec.STATE, target=i, a=float(now[0]), b=float(now[1]))
+
+    # --- 事件 ---
+    def _bind(self):
+        em = self.bm.events
+
+        def on_turn_start(ev, ctx):
+            self._sync()
+            self.turn += 1
+            self._put(Rec.TURN, actor=self._idx(ctx.actor))
+
+        def on_cast(ev, ctx):
+            i = self._idx(ctx.actor)
+            buffs = ctx.data.get("buffs", ())
+            sid = next((k for k, s in enumerate(ctx.actor.skills) if s.buffs is buffs), -1)
+            for k, b in enumerate(buffs):
+                self._refs[(i, b)] = (sid, k)
+            self._put(Rec.CAST, actor=i, skill=sid)
+
+        def on_before_attack(ev, ctx):
+            self._attacking = True
+
+        def on_after_attack(ev, ctx):
+            self._attacking = False
+            flags = (MISS if ctx.missed else 0) | (CRIT if ctx.get("crit") else 0)
+            self._put(Rec.HIT, flags, self._idx(ctx.actor), self._idx(ctx.target), a=float(ctx.dmg))
+
+        def on_after_take_damage(ev, ctx):
+            t = self._idx(ctx.target)
+            self._put(Rec.DAMAGE, ATTACK if self._attacking else 0,
+                      self._idx(ctx.actor), t, a=float(ctx.dmg))
+            if t >= 0:
+                self._sync((t,))
+
+        def buff_event(kind):
+            def on_buff(ev, ctx):
+                buff = ctx.data.get("buff")
+                src = self._idx(ctx.actor)
+                sid, k = self._refs.get((src, getattr(buff, "template", buff)), (-1, -1))
+                self._put(kind, actor=src, target=self._idx(ctx.target), skill=sid, aux=k)
+            return on_buff
+
+        def on_resolve(ev, ctx):
+            self._sync()
+            self._put(Rec.RESOLVE, actor=self._idx(ctx.actor))
+
+        def on_turn_end(ev, ctx):
+            self._sync()
+
+        # 最低優先：所有效果都結算完才記錄
+        for event, fn in ((EventType.TURN_START, on_turn_start),
+                          (EventType.SKILL_CAST, on_cast),
+                          (EventType.BEFORE_ATTACK, on_before_attack),
+                          (EventType.AFTER_ATTACK, on_after_attack),
+                          (EventType.AFTER_TAKE_DAMAGE, on_after_take_damage),
+                          (EventType.APPLY_BUFF, buff_event(Rec.BUFF)),
+                          (EventType.REMOVE_BUFF, buff_event(Rec.REMOVE)),
+                          (EventType.SKILL_RESOLVE, on_resolve),
+                          (EventType.TURN_END, on_turn_end)):
+            em.subscribe(event, fn, priority=-2000, owner=self)
+
+    def finish(self) -> bytes:
+        """寫入結束紀錄並解除訂閱；回傳完整的錄影內容"""
+        if not self._done:
+            self._done = True
+            self._sync()
+            side = [u["side"] for u in self.header["units"]]
+            alive = {side[i] for i, u in enumerate(self.units) if not u.is_dead()}
+            winner = 1 if alive == {0} else 2 if alive == {1} else 0
+            self._put(Rec.END, winner)
+            self.bm.events.unsubscribe_owner(self)
+        return self.to_bytes()
+
+    def to_bytes(self) -> bytes:
+        head = json.dumps(self.header, ensure_ascii=False).encode("utf-8")
+        return MAGIC + _HEAD.pack(VERSION, len(head)) + head + bytes(self.buf)
+
+    def save(self, path: str):
+        data = self.finish()
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wb") as f:
+            f.write(data)
+
+
+# ============================================================
+# 重播
+# ============================================================
+class ReplayBuff:
+    """重播用的 Buff 外觀（欄位與 UI 讀取的 BuffInstance 相同）"""
+    __slots__ = ("name", "desc", "effect", "duration", "percent", "base")
+
+    def __init__(self, row):
+        self.name, effect, self.duration, self.percent, self.base = row
+        self.effect = Effect[effect]
+        self.desc = ""
+
+
+class ReplayUnit:
+    """重播用的單位外觀：UI 只讀 name / hp / max_hp / shield / buffs"""
+
+    def __init__(self, data):
+        self.name = data["name"]
+        self.job = data["job"]
+        self.side = data["side"]
+        self.lv = data["lv"]
+        self.max_hp = data["max_hp"]
+        self.hp = data["hp"]
+        self.shield = data["shield"]
+        self.skills = [(s["name"], [ReplayBuff(r) for r in s["buffs"]]) for s in data["skills"]]
+        self.buffs = []
+
+    def is_dead(self):
+        return self.hp <= 0
+
+
+class BattleReplay:
+    def __init__(self, header, body: bytes, version: int = VERSION):
+        self._rec = rec = _RECS[version]
+        if len(body) % rec.size:
+            raise ValueError("錄影內容長度不正確")
+        self.header = header
+        self.body = body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BattleReplay":
+        if data[:4] != MAGIC:
+            raise ValueError("不是戰鬥錄影檔")
+        version, n = _HEAD.unpack_from(data, 4)
+        if version not in _RECS:
+            raise ValueError(f"不支援的錄影版本：{version}")
+        start = 4 + _HEAD.size
+        header = json.loads(data[start:start + n].decode("utf-8"))
+        return cls(header, data[start + n:], version)
+
+    @classmethod
+    def load(cls, path: str) -> "BattleReplay":
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def __len__(self):
+        return len(self.body) // self._rec.size
+
+    def __iter__(self):
+        for r in self._rec.iter_unpack(self.body):
+            yield Record(*r)
+
+    @property
+    def winner(self) -> int:
+        rec = self._rec
+        last = Record(*rec.unpack_from(self.body, len(self.body) - rec.size)) if self.body else None
+        return last.flags if last and last.kind == Rec.END else 0
+
+    def play(self, view=None, log=None):
+        """
+        依紀錄重建單位狀態並驅動 view（鴨子型別，與 BattleUI 相同的
+        update_health_bar / update_shield_bar / update_status_panel / append_log）。
+        log：(str) -> None，預設為 view.append_log。回傳重播用的單位列表。
+        """
+        units = [ReplayUnit(u) for u in self.header["units"]]
+        if log is None:
+            log = getattr(view, "append_log", None)
+
+        def refresh(u, status=False):
+            for name in ("update_health_bar", "update_shield_bar") + (("update_status_panel",) if status else ()):
+                fn = getattr(view, name, None)
+                if fn:
+                    fn(u)
+
+        for r in self:
+            if r.kind == Rec.STATE:
+                u = units[r.target]
+                u.hp, u.shield = r.a, r.b
+                refresh(u)
+            elif r.kind in (Rec.BUFF, Rec.REMOVE) and r.target >= 0:
+                u = units[r.target]
+                buff = self._buff(units, r)
+                if r.kind == Rec.BUFF and buff is not None and buff.duration != 0:
+                    u.buffs.append(ReplayBuff([buff.name, buff.effect.name, buff.duration,
+                                               buff.percent, buff.base]))
+                elif buff is not None:
+                    for k, b in enumerate(u.buffs):
+                        if b.name == buff.name:
+                            del u.buffs[k]
+                            break
+                refresh(u, status=True)
+            if log:
+                line = self._line(units, r)
+                if line:
+                    log(line)
+        return units
+
+    @staticmethod
+    def _buff(units, r):
+        if r.actor < 0 or r.skill < 0:
+            return None
+        return units[r.actor].skills[r.skill][1][r.aux]
+
+    def _line(self, units, r):
+        name = lambda i: units[i].name if i >= 0 else "?"
+        if r.kind == Rec.TURN:
+            return f"\n--- {name(r.actor)} 的回合 ---"
+        if r.kind == Rec.CAST and r.skill >= 0:
+            return f"{name(r.actor)} 使用技能【{units[r.actor].skills[r.skill][0]}】"
+        if r.kind == Rec.HIT:
+            if r.flags & MISS:
+                return f"{name(r.actor)} 攻擊 {name(r.target)} 被閃避了！"
+            crit = "（暴擊）" if r.flags & CRIT else ""
+            return f"{name(r.actor)} 對 {name(r.target)} 造成 {r.a:.0f} 點傷害{crit}"
+        if r.kind == Rec.DAMAGE and not r.flags & ATTACK:
+            return f"{name(r.target)} 損失了 {r.a:.0f} 點血量"
+        if r.kind == Rec.BUFF:
+            buff = self._buff(units, r)
+            # 立即結算（持續 0 回合）的 Buff 已有傷害 / 血量紀錄，不另外列出
+            return f"{name(r.target)} 獲得【{buff.name}】" if buff and buff.duration != 0 else None
+        if r.kind == Rec.REMOVE:
+            buff = self._buff(units, r)
+            return f"{name(r.target)} 的【{buff.name}】結束" if buff and buff.duration != 0 else None
+        if r.kind == Rec.END:
+            return {1: "☠️ B隊全滅，A隊勝利！", 2: "☠️ A隊全滅，B隊勝利！"}.get(r.flags, "⚔️ 雙方同歸於盡！")
+        return None
+
+    def stats(self):
+        """依 battle.sim 的定義彙總 (勝方, A 隊合計, B 隊合計)"""
+        from battle.sim import FIELDS
+        units = [ReplayUnit(u) for u in self.header["units"]]
+        sums = [[0.0] * len(FIELDS), [0.0] * len(FIELDS)]
+        for r in self:
+            if r.kind == Rec.HIT:
+                dmg = max(0, int(r.a))
+                if r.actor >= 0:
+                    sums[units[r.actor].side][0] += dmg
+                if r.target >= 0:
+                    sums[units[r.target].side][1] += dmg
+            elif r.kind == Rec.BUFF and r.actor >= 0:
+                sums[units[r.actor].side][3] += 1
+            elif r.kind == Rec.CAST and r.skill >= 0:
+                u = units[r.actor]
+                for b in u.skills[r.skill][1]:
+                    if b.effect == Effect.ADDHP:
+                        sums[u.side][2] += u.max_hp * b.percent + b.base
+        return self.winner, tuple(sums[0]), tuple(sums[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m battle.recorder", description="重播戰鬥錄影")
+    parser.add_argument("path")
+    parser.add_argument("--stats", action="store_true", help="只輸出統計（JSON）")
+    args = parser.parse_args(argv)
+
+    replay = BattleReplay.load(args.path)
+    if args.stats:
+        from battle.sim import FIELDS
+        winner, a, b = replay.stats()
+        print(json.dumps({"seed": replay.header.get("seed"), "records": len(replay), "winner": winner,
+                          "team_a": dict(zip(FIELDS, a)), "team_b": dict(zip(FIELDS, b))},
+                         ensure_ascii=False, indent=2))
+    else:
+        replay.play(log=print)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+# battle/rng.py
+# 每場戰鬥自有的亂數流：所有命中/暴擊判定與 AI 選擇都從這裡取
+import hashlib
+import random
+
+
+def derive_seed(run_id, battle_index: int) -> int:
+    """由 (執行 id, 第幾場) 推導 64-bit 種子；不同場次的亂數流互不重疊"""
+    h = hashlib.blake2b(f"{run_id}:{battle_index}".encode("utf-8"), digest_size=8)
+    return int.from_bytes(h.digest(), "little")
+
+
+def new_seed() -> int:
+    """未指定種子時隨機產生一個（記下即可重現該場戰鬥）"""
+    return random.SystemRandom().getrandbits(64)
+
+
+def unit_rng(unit):
+    """單位所屬戰鬥的 RNG；尚未綁定戰鬥時退回全域 random 模組"""
+    return getattr(unit, "rng", None) or random
@@ -0,0 +1,96 @@
+# battle/roster.py
+# 隊伍索引：存活名單與各目標策略的排序鍵（血量比例 / 血量 / 雙防 / 雙攻）增量維護。
+#
+# - 每個排序鍵一個 heap，元素為 (鍵值, 隊伍順序, 版本, 單位)；單位數值變動時推入新版本，
+#   舊元素在查詢時才丟棄（lazy deletion）→ first() 攤銷 O(log n)
+# - 平手時取隊伍順序較前者，與 min() / max() 走訪整隊的結果相同
+# - 由成員自己的 AFTER_TAKE_DAMAGE / STAT_CHANGE 事件驅動（以 target 訂閱，不收其他隊伍的事件）；
+#   死亡即血量歸零，查詢時一併移出存活名單
+import heapq
+
+from battle.event_manager import EventType
+
+# 鍵名 → (取值函式, 方向)；方向 -1 代表取最大值
+KEYS = {
+    "hp_ratio": (lambda u: u.hp / max(1, u.max_hp), 1),
+    "hp":       (lambda u: u.hp, -1),
+    "defense":  (lambda u: u.pdef + u.mdef, 1),
+    "threat":   (lambda u: u.patk + u.matk, -1),
+}
+
+
+class TeamRoster:
+    """一支隊伍的存活名單與排序索引；events 為 None 時不訂閱（單次查詢用的暫時索引）"""
+    __slots__ = ("members", "events", "_order", "_ver", "_alive", "_heaps", "_living")
+
+    def __init__(self, members, events=None):
+        self.members = tuple(members)
+        self.events = events
+        self._order = {u: i for i, u in enumerate(self.members)}
+        self._ver = [0] * len(self.members)
+        self._alive = [not u.is_dead() for u in self.members]
+        self._heaps = {}     # 鍵名 → heap（第一次查詢才建立）
+        self._living = None  # 存活名單快取（有人死亡 / 復活時清掉）
+        if events is not None:
+            for u in self.members:
+                events.subscribe(EventType.AFTER_TAKE_DAMAGE, self._on_change, priority=-1000, owner=self, target=u)
+                events.subscribe(EventType.STAT_CHANGE, self._on_change, priority=-1000, owner=self, target=u)
+
+    def dispose(self):
+        if self.events is not None:
+            self.events.unsubscribe_owner(self)
+
+    # --- 查詢 ---
+    @property
+    def living(self):
+        """存活成員（依隊伍順序的 tuple）"""
+        living = self._living
+        if living is None:
+            living = self._living = tuple(u for u, a in zip(self.members, self._alive) if a)
+        return living
+
+    def first(self, key):
+        """該排序鍵的第一名存活成員；全滅回傳 None"""
+        heap = self._heaps.get(key)
+        if heap is None:
+            heap = self._heaps[key] = self._build(key)
+        ver = self._ver
+        while heap:
+            top = heap[0]
+            if top[2] == ver[top[1]] and not top[3].is_dead():
+                return top[3]
+            heapq.heappop(heap)
+        return None
+
+    def __contains__(self, unit):
+        return unit in self._order
+
+    # --- 維護 ---
+    def touch(self, unit):
+        """unit 的數值變了：各排序鍵推入新版本"""
+        i = self._order.get(unit)
+        if i is None:
+            return
+        self._ver[i] += 1
+        alive = not unit.is_dead()
+        if alive != self._alive[i]:
+            self._alive[i] = alive
+            self._living = None
+        if not alive:
+            return
+        v = self._ver[i]
+        for key, heap in self._heaps.items():
+            fn, sign = KEYS[key]
+            heapq.heappush(heap, (sign * fn(unit), i, v, unit))
+            if len(heap) > 4 * len(self.members) + 16:
+                self._heaps[key] = self._build(key)  #過期元素太多時重建
+
+    def _build(self, key):
+        fn, sign = KEYS[key]
+        ver = self._ver
+        heap = [(sign * fn(u), i, ver[i], u) for i, u in enumerate(self.members) if not u.is_dead()]
+        heapq.heapify(heap)
+        return heap
+
+    def _on_change(self, ev, ctx):
+        self.touch(ctx.target)
@@ -0,0 +1,375 @@
+# battle/sim.py
+# 無頭批次模擬：python -m battle.sim matrix --rounds 1000
+# 向量化核心：python -m battle.sim kernel --rounds 10000（需要 numpy，見 battle/mc_kernel.py）
+# 把「職業組合 × 場次」切成小批，交給 ProcessPoolExecutor 平行執行
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from battle.rng import derive_seed
+
+# 每隊貢獻統計欄位（與 test.py 的 Contribution 相同）
+FIELDS = ("damage_given", "damage_taken", "heal_done", "buff_count")
+
+
+@dataclass(frozen=True)
+class BattleSpec:
+    """單場戰鬥的可序列化描述（送進子行程用）"""
+    job_a: str
+    job_b: str
+    level_a: int = 1
+    level_b: int = 1
+    seed: int = 0
+    team_size: int = 4
+    record: str = ""  # 錄影輸出目錄；空字串 = 不錄影
+
+
+@dataclass
+class PairStats:
+    """同一組 (job_a, job_b) 的累積結果；sums_* 依 FIELDS 排列，為整隊合計"""
+    job_a: str
+    job_b: str
+    games: int = 0
+    win_a: int = 0
+    win_b: int = 0
+    sums_a: Tuple[float, ...] = (0.0,) * len(FIELDS)
+    sums_b: Tuple[float, ...] = (0.0,) * len(FIELDS)
+
+    def merge(self, other: "PairStats"):
+        self.games += other.games
+        self.win_a += other.win_a
+        self.win_b += other.win_b
+        self.sums_a = tuple(x + y for x, y in zip(self.sums_a, other.sums_a))
+        self.sums_b = tuple(x + y for x, y in zip(self.sums_b, other.sums_b))
+
+    def to_dict(self) -> dict:
+        n = max(1, self.games)
+        return {
+            "jobs": [self.job_a, self.job_b],
+            "games": self.games,
+            "winrate": {self.job_a: self.win_a / n, self.job_b: self.win_b / n},
+            "average_contribution": {
+                self.job_a: {k: v / n for k, v in zip(FIELDS, self.sums_a)},
+                self.job_b: {k: v / n for k, v in zip(FIELDS, self.sums_b)},
+            },
+        }
+
+
+# ============================================================
+# 子行程端
+# ============================================================
+_ready = False
+
+
+def _init_worker(silence_stdout: bool = True):
+    """每個子行程只載入一次資料，並關掉所有文字輸出"""
+    global _ready
+    if _ready:
+        return
+    if silence_stdout:
+        sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    from battle.battle_log import OFF, set_log_level
+    from battle.team_factory import TeamFactory
+    set_log_level(OFF)  # 不組字串、不輸出
+    TeamFactory.init()
+    _ready = True
+
+
+def run_battle(spec: BattleSpec) -> Tuple[int, Tuple[float, ...], Tuple[float, ...]]:
+    """
+    跑一場戰鬥，回傳 (勝方, A 隊合計, B 隊合計)。
+    勝方：1 = A 勝、2 = B 勝、0 = 同歸於盡
+    """
+    from battle.ai_controller import AIController
+    from battle.battle_manager import BattleManager
+    from battle.event_manager import EventManager, EventType
+    from character.character import Character
+
+    team_a = [Character(f"{spec.job_a}{i}", spec.job_a) for i in range(spec.team_size)]
+    team_b = [Character(f"{spec.job_b}{i}", spec.job_b) for i in range(spec.team_size)]
+    for c in team_a:
+        c.set_lv(spec.level_a)
+    for c in team_b:
+        c.set_lv(spec.level_b)
+
+    ai_a, ai_b = AIController(), AIController()
+    for c in team_a:
+        c.controller = ai_a
+    for c in team_b:
+        c.controller = ai_b
+
+    bm = BattleManager(controller=ai_a, events=EventManager(), seed=spec.seed)
+    side = {id(c): 0 for c in team_a}
+    side.update({id(c): 1 for c in team_b})
+    sums = [[0.0] * len(FIELDS), [0.0] * len(FIELDS)]
+
+    def after_attack(ev, ctx):
+        dmg = max(0, int(ctx.dmg))
+        if ctx.actor is not None:
+            sums[side[id(ctx.actor)]][0] += dmg
+        if ctx.target is not None:
+            sums[side[id(ctx.target)]][1] += dmg
+
+    def apply_buff(ev, ctx):
+        if ctx.actor is not None:
+            sums[side[id(ctx.actor)]][3] += 1
+
+    def skill_resolve(ev, ctx):
+        actor = ctx.actor
+        for buff in ctx.data.get("buffs", []):
+            if buff.effect.name == "ADDHP":
+                sums[side[id(actor)]][2] += actor.max_hp * buff.percent + buff.base
+
+    bm.events.subscribe(EventType.AFTER_ATTACK, after_attack)
+    bm.events.subscribe(EventType.APPLY_BUFF, apply_buff)
+    bm.events.subscribe(EventType.SKILL_RESOLVE, skill_resolve)
+
+    rec = None
+    if spec.record:
+        from battle.recorder import BattleRecorder
+        rec = BattleRecorder(bm, team_a, team_b)
+
+    bm.battle(team_a, team_b)
+
+    if rec is not None:
+        rec.save(os.path.join(spec.record, f"{spec.job_a}-{spec.job_b}-{spec.seed:016x}.brec.gz"))
+
+    a_alive = bm.alive(team_a)
+    b_alive = bm.alive(team_b)
+    winner = 1 if a_alive and not b_alive else 2 if b_alive and not a_alive else 0
+    return winner, tuple(sums[0]), tuple(sums[1])
+
+
+def run_batch(specs: Sequence[BattleSpec]) -> PairStats:
+    """同一組職業的一批戰鬥，在子行程內先行彙總，只回傳小小的 PairStats"""
+    stats = PairStats(specs[0].job_a, specs[0].job_b)
+    for spec in specs:
+        winner, a, b = run_battle(spec)
+        stats.merge(PairStats(spec.job_a, spec.job_b, 1,
+                              int(winner == 1), int(winner == 2), a, b))
+    return stats
+
+
+# ============================================================
+# 主行程端
+# ============================================================
+def matrix_specs(jobs: Sequence[str], rounds: int, *, level: int = 1,
+                 seed: int = 0, team_size: int = 4, record: str = "") -> List[BattleSpec]:
+    """所有職業兩兩對戰（i < j）× rounds 場"""
+    specs = []
+    for i in range(len(jobs)):
+        for j in range(i + 1, len(jobs)):
+            for _ in range(rounds):
+                # 種子由 (本次執行種子, 第幾場) 推導，與子行程如何分批無關
+                specs.append(BattleSpec(jobs[i], jobs[j], level, level,
+                                        derive_seed(seed, len(specs)), team_size, record))
+    return specs
+
+
+def _chunks(specs: Sequence[BattleSpec], size: int):
+    # 依職業組合切塊，確保每塊只屬於單一組合
+    chunk: List[BattleSpec] = []
+    for spec in specs:
+        if chunk and (len(chunk) >= size or
+                      (spec.job_a, spec.job_b) != (chunk[0].job_a, chunk[0].job_b)):
+            yield chunk
+            chunk = []
+        chunk.append(spec)
+    if chunk:
+        yield chunk
+
+
+def run_matrix(specs: Sequence[BattleSpec], *, workers: Optional[int] = None,
+               chunk: int = 50) -> List[PairStats]:
+    results: Dict[Tuple[str, str], PairStats] = {}
+
+    def collect(stats: PairStats):
+        key = (stats.job_a, stats.job_b)
+        if key in results:
+            results[key].merge(stats)
+        else:
+            results[key] = stats
+
+    batches = list(_chunks(specs, chunk))
+    if workers == 1:
+        # 單行程（除錯用）：只在執行期間靜音
+        _init_worker(silence_stdout=False)
+        with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+            for stats in map(run_batch, batches):
+                collect(stats)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for stats in pool.map(run_batch, batches):
+                collect(stats)
+    return list(results.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m battle.sim", description="無頭批次戰鬥模擬")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    mx = sub.add_parser("matrix", help="全職業兩兩對戰")
+    mx.add_argument("--rounds", type=int, default=30, help="每組職業的場數")
+    mx.add_argument("--jobs", default="", help="以逗號分隔；預設為 jobs.json 全部職業")
+    mx.add_argument("--level", type=int, default=1)
+    mx.add_argument("--team-size", type=int, default=4)
+    mx.add_argument("--seed", type=int, default=0, help="本次執行的種子")
+    mx.add_argument("--workers", type=int, default=None, help="子行程數，預設為 CPU 核心數")
+    mx.add_argument("--chunk", type=int, default=50, help="每批送進子行程的場數")
+    mx.add_argument("--out", default="", help="輸出 JSON 檔；預設印到 stdout")
+    mx.add_argument("--record", default="", help="把每場戰鬥錄影到此目錄（python -m battle.recorder 重播）")
+
+    kn = sub.add_parser("kernel", help="以向量化核心（numpy）跑全職業兩兩對戰")
+    kn.add_argument("--rounds", type=int, default=10000, help="每組職業的場數")
+    kn.add_argument("--jobs", default="", help="以逗號分隔；預設為核心支援的全部職業")
+    kn.add_argument("--level", type=int, default=1)
+    kn.add_argument("--team-size", type=int, default=4)
+    kn.add_argument("--seed", type=int, default=0, help="本次執行的種子")
+    kn.add_argument("--out", default="", help="輸出 JSON 檔；預設印到 stdout")
+
+    va = sub.add_parser("validate", help="比對向量化核心與 BattleManager 的勝率")
+    va.add_argument("--rounds", type=int, default=200, help="BattleManager 每組場數")
+    va.add_argument("--kernel-rounds", type=int, default=20000, help="核心每組場數")
+    va.add_argument("--jobs", default="Warrior,Cleric,Sorcerer,Guardian",
+                    help="以逗號分隔；all = 核心支援的全部職業")
+    va.add_argument("--level", type=int, default=1)
+    va.add_argument("--team-size", type=int, default=4)
+    va.add_argument("--seed", type=int, default=0)
+    va.add_argument("--workers", type=int, default=None)
+    va.add_argument("--z", type=float, default=4.0, help="|z| 超過此值即判定不一致")
+
+    args = parser.parse_args(argv)
+
+    from character.jobs_library import JobLibrary
+    JobLibrary.init("jobs.json")
+    if args.cmd == "kernel":
+        return _kernel_cmd(parser, args)
+    if args.cmd == "validate":
+        return _validate_cmd(parser, args)
+
+    jobs = [j for j in args.jobs.split(",") if j] or list(JobLibrary.jobs.keys())
+    unknown = [j for j in jobs if j not in JobLibrary.jobs]
+    if unknown:
+        parser.error(f"未知職業：{', '.join(unknown)}")
+
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    specs = matrix_specs(jobs, args.rounds, level=args.level, seed=args.seed,
+                         team_size=args.team_size, record=args.record)
+    t0 = time.perf_counter()
+    results = run_matrix(specs, workers=args.workers, chunk=args.chunk)
+    elapsed = time.perf_counter() - t0
+    _write(results, args.out)
+    print(f"▶ {len(specs)} 場，{elapsed:.1f} 秒（{len(specs) / max(elapsed, 1e-9):.0f} 場/秒）",
+          file=sys.stderr)
+
+
+def _write(results: Sequence[PairStats], out: str):
+    text = json.dumps([r.to_dict() for r in results], ensure_ascii=False, indent=2)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+def _kernel_jobs(parser, text: str) -> List[str]:
+    """解析 --jobs，並確認每個職業都在核心支援範圍內"""
+    from character.jobs_library import JobLibrary
+    from battle import mc_kernel
+    from battle.team_factory import TeamFactory
+    # 不能呼叫 _init_worker：fork 出來的子行程會繼承 _ready 而不再靜音
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        TeamFactory.init()
+    if text in ("", "all"):
+        return mc_kernel.supported_jobs()
+    jobs = [j for j in text.split(",") if j]
+    unknown = [j for j in jobs if j not in JobLibrary.jobs]
+    if unknown:
+        parser.error(f"未知職業：{', '.join(unknown)}")
+    bad = {j: mc_kernel.unsupported(j) for j in jobs}
+    bad = {j: v for j, v in bad.items() if v}
+    if bad:
+        parser.error("核心不支援：" + "；".join(f"{j}（{', '.join(v)}）" for j, v in bad.items()))
+    return jobs
+
+
+def _kernel_pairs(jobs: Sequence[str], rounds: int, args) -> List[PairStats]:
+    from battle.mc_kernel import run_pair
+    results = []
+    for i in range(len(jobs)):
+        for j in range(i + 1, len(jobs)):
+            results.append(run_pair(jobs[i], jobs[j], rounds, level_a=args.level,
+                                    level_b=args.level, team_size=args.team_size,
+                                    seed=derive_seed(args.seed, len(results))))
+    return results
+
+
+def _kernel_cmd(parser, args):
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        parser.error("kernel 需要 numpy：pip install numpy")
+    jobs = _kernel_jobs(parser, args.jobs)
+    t0 = time.perf_counter()
+    results = _kernel_pairs(jobs, args.rounds, args)
+    elapsed = time.perf_counter() - t0
+    _write(results, args.out)
+    total = sum(r.games for r in results)
+    print(f"▶ {total} 場（核心），{elapsed:.1f} 秒（{total / max(elapsed, 1e-9):.0f} 場/秒）",
+          file=sys.stderr)
+
+
+def win_rate_z(w1: int, n1: int, w2: int, n2: int) -> float:
+    """
+    兩組勝場的雙比例 z 值（第二組減第一組）：標準誤取合併比例 p = (w1 + w2) / (n1 + n2)，
+    某一組剛好全勝 / 全敗時也不會因為該組變異數為 0 而把 z 放大。兩組都全勝或全敗時回傳 0。
+
+    >>> round(win_rate_z(0, 60, 760, 20000), 2)   # 引擎 0/60 對核心 3.8%：約 10% 會發生，不算不一致
+    1.54
+    >>> abs(win_rate_z(0, 60, 760, 20000)) < 4.0
+    True
+    >>> win_rate_z(0, 60, 0, 20000)
+    0.0
+    >>> abs(win_rate_z(30, 60, 4000, 20000)) > 4.0  # 50% 對 20%：真的不一致
+    True
+    """
+    p = (w1 + w2) / (n1 + n2)
+    se = (p * (1 - p) * (1 / n1 + 1 / n2)) ** 0.5
+    if se == 0.0:
+        return 0.0
+    return (w2 / n2 - w1 / n1) / se
+
+
+def _validate_cmd(parser, args):
+    """同樣的職業組合各跑一次 BattleManager 與核心，以勝率的 z 值判斷是否一致"""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        parser.error("validate 需要 numpy：pip install numpy")
+    jobs = _kernel_jobs(parser, args.jobs)
+    engine = run_matrix(matrix_specs(jobs, args.rounds, level=args.level,
+                                     seed=args.seed, team_size=args.team_size),
+                        workers=args.workers)
+    engine = {(r.job_a, r.job_b): r for r in engine}
+    worst = 0.0
+    for k in _kernel_pairs(jobs, args.kernel_rounds, args):
+        e = engine[(k.job_a, k.job_b)]
+        p1, p2 = e.win_a / e.games, k.win_a / k.games
+        z = win_rate_z(e.win_a, e.games, k.win_a, k.games)
+        worst = max(worst, abs(z))
+        mark = "✗" if abs(z) > args.z else "✓"
+        print(f"{mark} {k.job_a:>14} vs {k.job_b:<14} 引擎 {p1:6.3f}  核心 {p2:6.3f}  z={z:+.2f}")
+    print(f"▶ 最大 |z| = {worst:.2f}（門檻 {args.z}）", file=sys.stderr)
+    if worst > args.z:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,62 @@
 from battle.buff import Buff, Target
+from battle.battle_log import log, INFO, WARNING
 
-class Skill:
-    def __init__(self, name, desc, cd, cost, buffs,target=Target.ENEMY, growth = None):
+class SkillTemplate:
+    """技能模板：同名技能整個程式只有一份，所有角色共用（不可修改）"""
+    def __init__(self, name, desc, cd, cost, buffs, target=Target.ENEMY, growth = None):
         self.name = name
         self.desc = desc
         self.cd = cd
-        self.cdtime = 0
         self.cost = cost
-        self.buffs = buffs
+        self.buffs = tuple(buffs)
         self.target = target
         self.maxLevel = 10
+        self.growth_map = growth or {}
+        self._by_level = {1: self.buffs}  # 等級 → 該等級的 Buff 模板（惰性建立）
+
+    def can_grow(self):
+        return any(self.growth_map.get(b.name) for b in self.buffs)
+
+    def buffs_at(self, level):
+        """依等級推導數值：Lv.n = 基礎值 + 成長值 × (n - 1)"""
+        buffs = self._by_level.get(level)
+        if buffs is None:
+            buffs = tuple(self._scaled(b, level) for b in self.buffs)
+            self._by_level[level] = buffs
+        return buffs
+
+    def _scaled(self, buff, level):
+        growth = self.growth_map.get(buff.name)
+        if not growth:
+            return buff
+        steps = level - 1
+        scaled = Buff(buff.target, buff.phase, buff.name, buff.desc, buff.duration, buff.effect,
+                      percent=buff.percent + growth.get("percent", 0) * steps,
+                      base=buff.base + growth.get("base", 0) * steps)
+        scaled.mark_key = getattr(buff, "mark_key", None)
+        return scaled
+
+class Skill:
+    """角色身上的技能：只記錄冷卻與等級，其餘欄位取自共用的 SkillTemplate"""
+    __slots__ = ("template", "cd", "cdtime", "currLevel")
+
+    def __init__(self, template):
+        self.template = template
+        self.cd = template.cd
+        self.cdtime = 0
         self.currLevel = 1
-        self.growth_map = growth
+
+    # --- 模板欄位（唯讀） ---
+    name       = property(lambda self: self.template.name)
+    desc       = property(lambda self: self.template.desc)
+    cost       = property(lambda self: self.template.cost)
+    target     = property(lambda self: self.template.target)
+    maxLevel   = property(lambda self: self.template.maxLevel)
+    growth_map = property(lambda self: self.template.growth_map)
+
+    @property
+    def buffs(self):
+        return self.template.buffs_at(self.currLevel)
 
     def is_available(self):
         return self.cdtime == 0
@@ -22,24 +67,18 @@ class Skill:
 
     def next_turn(self):
         self.cdtime = max(0, self.cdtime - 1)
-    
+
     def level_up(self):
         if self.currLevel >= self.maxLevel:
-            print(f"{self.name} 已達最高等級 Lv.{self.maxLevel}")
+            log(INFO, "{} 已達最高等級 Lv.{}", self.name, self.maxLevel)
             return False
 
-        upgraded = False
-        for buff in self.buffs:
-            growth = self.growth_map.get(buff.name)
-            if growth:
-                buff.percent += growth.get("percent", 0)
-                buff.base += growth.get("base", 0)
-                upgraded = True
+        upgraded = self.template.can_grow()
 
         if upgraded:
             self.currLevel += 1
-            print(f"✨ {self.name} 升級為 Lv.{self.currLevel}")
+            log(INFO, "✨ {} 升級為 Lv.{}", self.name, self.currLevel)
         else:
-            print(f"⚠️ {self.name} 無對應成長設定，升級無效")
+            log(WARNING, "⚠️ {} 無對應成長設定，升級無效", self.name)
 
-        return upgraded
\ No newline at end of file
+        return upgraded
@@ -1,11 +1,10 @@
 import json
 import os
-import copy
-from battle.skill import Skill
+from battle.skill import Skill, SkillTemplate
 from battle.buff import Buff, Target, Phase, Effect
 
 class SkillLibrary:
-    skills = {}
+    skills = {}  # 名稱 → SkillTemplate（全角色共用）
 
     @staticmethod
     def init(json_file="battle/skills.json"):
@@ -35,8 +34,8 @@ class SkillLibrary:
                 buff.mark_key = b.get("mark_key")
                 buffs.append(buff) # <--- 加入列表
             
-            # 2.在 Buff 迴圈結束後，才建立 Skill 物件
-            skill = Skill(
+            # 2.在 Buff 迴圈結束後，才建立技能模板
+            skill = SkillTemplate(
                 name=name,
                 desc=info["desc"],
                 cd=info["cd"],
@@ -51,4 +50,6 @@ class SkillLibrary:
 
     @staticmethod
     def get(name):
-        return copy.deepcopy(SkillLibrary.skills.get(name))
+        # 只建立輕量的角色技能狀態（冷卻/等級），模板與 Buff 共用
+        template = SkillLibrary.skills.get(name)
+        return Skill(template) if template else None
@@ -1,14 +1,29 @@
 # battle/ui_sync.py
+import threading
+
 from battle.event_manager import event_manager, EventType
 
+HP, SHIELD, BUFFS = 1, 2, 4
+ALL_FIELDS = HP | SHIELD | BUFFS
+
+
 class HealthBarSync:
     """
     負責監聽戰鬥事件並更新 UI，
     確保子執行緒發出的事件安全地回到主執行緒執行。
+
+    事件只把角色標記為「髒」（連同變動的欄位），
+    每個 UI 影格最多排一次 _flush，且只重畫數值真的有變的面板。
     """
-    def __init__(self, ui, characters):
+    def __init__(self, ui, characters, events=None):
         self.ui = ui
         self.characters = list(characters)
+        self.events = events or event_manager  #要監聽的戰鬥匯流排
+        self._lock = threading.Lock()
+        self._dirty = {}          # ch → 欄位位元
+        self._all = False         # 全體刷新（多次合併成一次）
+        self._scheduled = False
+        self._shown = {}          # ch → 上次畫出的 (hp, shield, buff 摘要)
         self._bind()
 
     def _on_ui(self, fn, *args):
@@ -20,46 +35,92 @@ class HealthBarSync:
             except Exception:
                 pass
 
+    # --- 標記（戰鬥執行緒） ---
+    def _mark(self, ch, fields):
+        with self._lock:
+            self._dirty[ch] = self._dirty.get(ch, 0) | fields
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._on_ui(self._flush)
+
+    def _mark_all(self):
+        with self._lock:
+            self._all = True
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._on_ui(self._flush)
+
+    # 相容舊介面：立即標記
     def _refresh_for(self, ch):
-        if hasattr(self.ui, "update_health_bar"):
-            self._on_ui(self.ui.update_health_bar, ch)
-        if hasattr(self.ui, "update_shield_bar"):
-            self._on_ui(self.ui.update_shield_bar, ch)
-        if hasattr(self.ui, "update_status_panel"):
-            self._on_ui(self.ui.update_status_panel, ch)
+        self._mark(ch, ALL_FIELDS)
 
     def _refresh_all(self):
-        for ch in self.characters:
-            self._refresh_for(ch)
+        self._mark_all()
+
+    # --- 繪製（UI 執行緒） ---
+    @staticmethod
+    def _state(ch):
+        buffs = tuple((b.name, b.duration) for b in list(getattr(ch, "buffs", ())))
+        return ch.hp, getattr(ch, "shield", 0), buffs
+
+    def _flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            full, self._all = self._all, False
+            self._scheduled = False
+        if full:
+            for ch in self.characters:
+                dirty[ch] = dirty.get(ch, 0) | ALL_FIELDS
+
+        for ch, fields in dirty.items():
+            now = self._state(ch)
+            last = self._shown.get(ch)
+            if last is not None:
+                # 只保留真的變動的欄位
+                changed = (HP if now[0] != last[0] else 0) | \
+                          (SHIELD if now[1] != last[1] else 0) | \
+                          (BUFFS if now[2] != last[2] else 0)
+                fields &= changed
+            if not fields:
+                continue
+            self._shown[ch] = now
+            if fields & HP and hasattr(self.ui, "update_health_bar"):
+                self.ui.update_health_bar(ch)
+            if fields & SHIELD and hasattr(self.ui, "update_shield_bar"):
+                self.ui.update_shield_bar(ch)
+            if fields & BUFFS and hasattr(self.ui, "update_status_panel"):
+                self.ui.update_status_panel(ch)
 
     def _bind(self):
-        # 造成/承受傷害 → 更新相關角色
+        # 造成/承受傷害 → 只有血量 / 護盾可能變動
         def on_after_take_damage(ev, ctx):
             tgt = getattr(ctx, "target", None)
             act = getattr(ctx, "actor",  None)
-            if tgt: self._refresh_for(tgt)
-            if act: self._refresh_for(act)
+            if tgt: self._mark(tgt, HP | SHIELD)
+            if act: self._mark(act, HP | SHIELD)
 
-        # 技能結算（多半會套/消 buff）→ 全體刷新一次
+        # 技能結算（多半會套/消 buff）→ 全體檢查一次
         def on_skill_resolve(ev, ctx):
-            self._refresh_all()
+            self._mark_all()
 
         # 套/移除 buff（如護盾）
         def on_buff_change(ev, ctx):
             tgt = getattr(ctx, "target", None) or getattr(ctx, "owner", None)
-            if tgt: self._refresh_for(tgt)
+            if tgt: self._mark(tgt, ALL_FIELDS)
 
-        # 回合邊界（持續效果、DOT/護盾衰減等）→ 全體刷新
+        # 回合邊界（持續效果、DOT/護盾衰減等）→ 全體檢查
         def on_turn(ev, ctx):
-            self._refresh_all()
+            self._mark_all()
 
-        event_manager.subscribe(EventType.AFTER_TAKE_DAMAGE, on_after_take_damage, priority=-1000, owner=self)
-        event_manager.subscribe(EventType.SKILL_RESOLVE,     on_skill_resolve,     priority=-1000, owner=self)
-        event_manager.subscribe(EventType.APPLY_BUFF,        on_buff_change,       priority=-1000, owner=self)
-        event_manager.subscribe(EventType.REMOVE_BUFF,       on_buff_change,       priority=-1000, owner=self)
-        event_manager.subscribe(EventType.TURN_START,        on_turn,              priority=-1000, owner=self)
-        event_manager.subscribe(EventType.TURN_END,          on_turn,              priority=-1000, owner=self)
+        self.events.subscribe(EventType.AFTER_TAKE_DAMAGE, on_after_take_damage, priority=-1000, owner=self)
+        self.events.subscribe(EventType.SKILL_RESOLVE,     on_skill_resolve,     priority=-1000, owner=self)
+        self.events.subscribe(EventType.APPLY_BUFF,        on_buff_change,       priority=-1000, owner=self)
+        self.events.subscribe(EventType.REMOVE_BUFF,       on_buff_change,       priority=-1000, owner=self)
+        self.events.subscribe(EventType.TURN_START,        on_turn,              priority=-1000, owner=self)
+        self.events.subscribe(EventType.TURN_END,          on_turn,              priority=-1000, owner=self)
 
 
     def dispose(self):
-        event_manager.unsubscribe_owner(self)
+        self.events.unsubscribe_owner(self)
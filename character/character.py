@@ -1,6 +1,7 @@
 from battle.effect_registry import EffectRegistry
 from battle import buff as Buff
 from battle.event_manager import event_manager, EventType, EventContext
+from battle.battle_log import log, INFO, WARNING
 basichp = 100
 basicpatk = 10
 basicpdef = 6
@@ -13,7 +14,23 @@ basicmiss = 0.05
 basichit = 0.05
 basicshield = 0
 
+def _fmt_created(c):
+    return f"{c.name} ({c.job}) 已建立，技能：{[s.name for s in c.skills]}"
+
+# 屬性編號：STATS[i] 為目前值、MAX_STATS[i] 為上限（max_ 前綴）
+STATS = ("hp", "patk", "pdef", "matk", "mdef", "vit", "cri", "cridmg", "miss", "hit")
+MAX_STATS = tuple("max_" + s for s in STATS)
+HP, PATK, PDEF, MATK, MDEF, VIT, CRI, CRIDMG, MISS, HIT = range(len(STATS))
+# add_stat 的下限（None = 不設限，與 add_xxx 相同）
+STAT_FLOOR = (0, 0, 0, 0, 0, None, 0.0, basiccridmg, 0.0, 0.0)
+
 class Character():
+    # 屬性與常用欄位放在 slot（不佔 __dict__、存取較快）；
+    # 保留 __dict__ 給 controller / ai_feature_str / _marks 等外掛欄位
+    __slots__ = STATS + MAX_STATS + (
+        "shield", "lv", "exp", "name", "job", "stats", "buffs", "skills",
+        "skip_turn", "stun", "events", "rng", "_job_growth", "_mods", "__dict__", "__weakref__")
+
     def __init__(self,name,job,hp = basichp,patk = basicpatk ,pdef = basicpdef,matk = basicmatk,mdef = basicmdef):
         from character.jobs_library import JobLibrary
         from battle.skill_library import SkillLibrary
@@ -34,17 +51,20 @@ class Character():
         self.max_miss = self.miss = 0.05 * stats["miss"]
         self.max_hit  = self.hit = basichit
         self.shield = basicshield
-        self.buffs = []
+        self._mods = None  #屬性編號 → [固定加值合計, 百分比合計, 修正數]；沒有修正時為 None
+        self.buffs = Buff.BuffStore()  #依階段分桶；走訪順序同加入順序
         self.skills = []
         self.skip_turn = False
         self.stun = 0
+        self.events = event_manager  #所屬戰鬥的事件匯流排；BattleManager.battle() 會改綁
+        self.rng = None  #所屬戰鬥的亂數流；未綁定時用全域 random
         self._job_growth = job_data.get("growth_per_level", {})
         for skill_name in job_data["skills"]:
             skill = SkillLibrary.get(skill_name)
             if skill:
                 self.skills.append(skill)
 
-        print(f"{self.name} ({self.job}) 已建立，技能：{[s.name for s in self.skills]}")
+        log(INFO, _fmt_created, self)
 
         
     def is_dead(self) ->bool :
@@ -52,8 +72,9 @@ class Character():
     
     def take_damage(self, dmg, attacker=None):
         # 允許事件修改最終傷害
+        em = self.events
         ctx = EventContext(actor=attacker, target=self, dmg=float(dmg))
-        event_manager.emit(EventType.BEFORE_TAKE_DAMAGE, ctx=ctx)
+        em.emit(EventType.BEFORE_TAKE_DAMAGE, ctx=ctx)
 
         # 把可修改過的傷害帶入護盾/無敵等傳統結算
         damage = max(0.0, ctx.dmg)
@@ -74,7 +95,7 @@ class Character():
 
         # 扣血後事件（提供實際造成的數字）
         ctx.dmg = float(actual)
-        event_manager.emit(EventType.AFTER_TAKE_DAMAGE, ctx=ctx)
+        em.emit(EventType.AFTER_TAKE_DAMAGE, ctx=ctx)
         return actual
         
     
@@ -90,6 +111,55 @@ class Character():
                 self.shield -= absorbed
                 damage -= absorbed
             self.hp = max(0, self.hp - damage)
+        self.events.fire(EventType.STAT_CHANGE, target=self)
+
+    # === 以編號存取屬性（效果表用，不經過字串 getattr） ===
+    def get_stat(self, i):
+        return _CUR[i].__get__(self)
+
+    def get_max_stat(self, i):
+        return _MAX[i].__get__(self)
+
+    def add_stat(self, i, add):
+        floor = STAT_FLOOR[i]
+        val = _CUR[i].__get__(self) + add
+        _CUR[i].__set__(self, val if floor is None else max(floor, val))
+        self.events.fire(EventType.STAT_CHANGE, target=self)
+
+    # === 屬性修正：Buff 只登記加成，目前值由上限與修正合計推導 ===
+    # 目前值 = max(下限, (上限 + 固定加值合計) × (1 + 百分比合計))
+    def add_modifier(self, i, flat=0.0, pct=0.0):
+        mods = self._mods
+        if mods is None:
+            mods = self._mods = {}
+        m = mods.get(i)
+        if m is None:
+            m = mods[i] = [0.0, 0.0, 0]
+        m[0] += flat
+        m[1] += pct
+        m[2] += 1
+        self._derive(i)
+
+    def remove_modifier(self, i, flat=0.0, pct=0.0):
+        m = self._mods.get(i) if self._mods else None
+        if m is None:
+            return
+        m[2] -= 1
+        if m[2] <= 0:
+            del self._mods[i]  #最後一個修正移除時直接歸零，不殘留浮點誤差
+        else:
+            m[0] -= flat
+            m[1] -= pct
+        self._derive(i)
+
+    def _derive(self, i):
+        m = self._mods.get(i) if self._mods else None
+        val = _MAX[i].__get__(self)
+        if m is not None:
+            val = (val + m[0]) * (1.0 + m[1])
+        floor = STAT_FLOOR[i]
+        _CUR[i].__set__(self, val if floor is None else max(floor, val))
+        self.events.fire(EventType.STAT_CHANGE, target=self)
 
     def add_shield(self, add):
         self.shield = max(0, self.shield + add)
@@ -97,15 +167,19 @@ class Character():
     # === 攻防數值 ===
     def add_patk(self, add):
         self.patk = max(0, self.patk + add)
+        self.events.fire(EventType.STAT_CHANGE, target=self)
 
     def add_matk(self, add):
         self.matk = max(0, self.matk + add)
+        self.events.fire(EventType.STAT_CHANGE, target=self)
 
     def add_pdef(self, add):
         self.pdef = max(0, self.pdef + add)
+        self.events.fire(EventType.STAT_CHANGE, target=self)
 
     def add_mdef(self, add):
         self.mdef = max(0, self.mdef + add)
+        self.events.fire(EventType.STAT_CHANGE, target=self)
 
     # === 爆擊相關 ===
     def add_cri(self, add):
@@ -126,7 +200,7 @@ class Character():
     #接收效果
     def receive_buff(self, src, buff):
         buff.source = src
-        event_manager.emit(EventType.APPLY_BUFF, actor=src, target=self, skill=None, data={"buff": buff})
+        self.events.fire(EventType.APPLY_BUFF, actor=src, target=self, skill=None, data={"buff": buff})
         if buff.phase == Buff.Phase.APPLY:
             # 立刻生效（會註冊 BEFORE_TAKE_DAMAGE 等事件）
             EffectRegistry.apply[buff.effect](src, self, buff)
@@ -136,10 +210,10 @@ class Character():
         else:
             self.buffs.append(buff)
 
-    #觸發時機
+    #觸發時機：只走訪該階段的 Buff（以及外部標記為到期的 Buff）
     def trigger_phase(self, phase):
-        expired = []
-        for buff in self.buffs:
+        store = self.buffs
+        for buff in store.of_phase(phase):
             if buff.phase == phase:
                 if phase == Buff.Phase.APPLY:
                     # ✅ 首次不扣回合；之後經過 APPLY 才開始倒數
@@ -155,12 +229,9 @@ class Character():
             if buff.duration <= 0:
                 # 解除
                 EffectRegistry.remove[buff.effect](buff.source, self, buff)
-                event_manager.emit(EventType.REMOVE_BUFF, actor=buff.source, target=self,
+                self.events.fire(EventType.REMOVE_BUFF, actor=buff.source, target=self,
                                 data={"buff": buff})
-                expired.append(buff)
-
-        for b in expired:
-            self.buffs.remove(b)
+                store.discard(buff)
 
         
     #處理眩暈
@@ -170,16 +241,15 @@ class Character():
     
     #處理立即觸發之長時間效果
     def buff_end_round(self):
-        expired = []
-        for buff in self.buffs:
+        store = self.buffs
+        for buff in store.of_phase(Buff.Phase.APPLY):
             if buff.phase == Buff.Phase.APPLY:
                 buff.duration -= 1
             if buff.duration <= 0:
                 EffectRegistry.remove[buff.effect](buff.source, self, buff)
-                event_manager.emit(EventType.REMOVE_BUFF, actor=buff.source, target=self, data={"buff": buff})  # ★ 新增
-                expired.append(buff)
-        for b in expired:
-            self.buffs.remove(b)              
+                self.events.fire(EventType.REMOVE_BUFF, actor=buff.source, target=self, data={"buff": buff})  # ★ 新增
+                store.discard(buff)
+
     #展示學會之技能
     def show_skills(self):
         for i, s in enumerate(self.skills):
@@ -202,9 +272,9 @@ class Character():
         skill = SkillLibrary.get(skill_name)
         if skill:
             self.skills.append(skill)   # 加入 Skill 物件
-            print(f"{self.name} 學會了技能【{skill_name}】！")
+            log(INFO, "{} 學會了技能【{}】！", self.name, skill_name)
         else:
-            print(f"❌ 技能 {skill_name} 不存在於技能庫")
+            log(WARNING, "❌ 技能 {} 不存在於技能庫", skill_name)
 
     def level_up(self, times: int = 1):
         for _ in range(times):
@@ -218,11 +288,11 @@ class Character():
             inc_cri  = self._growth_inc("cri",  self.lv)
 
             self.max_hp  += inc_hp;   self.hp  += inc_hp
-            self.max_patk+= inc_patk; self.patk+= inc_patk
-            self.max_pdef+= inc_pdef; self.pdef+= inc_pdef
-            self.max_matk+= inc_matk; self.matk+= inc_matk
-            self.max_mdef+= inc_mdef; self.mdef+= inc_mdef
-            self.max_cri += inc_cri;  self.cri += inc_cri
+            self.max_patk+= inc_patk; self._derive(PATK)
+            self.max_pdef+= inc_pdef; self._derive(PDEF)
+            self.max_matk+= inc_matk; self._derive(MATK)
+            self.max_mdef+= inc_mdef; self._derive(MDEF)
+            self.max_cri += inc_cri;  self._derive(CRI)
 
     
     def obtained_exp(self, earned_exp: int):
@@ -241,4 +311,9 @@ class Character():
             
         # 乘上職業基礎倍率 (self.stats)
         mult = float(self.stats.get(key, 1.0))
-        return float(raw) * mult
\ No newline at end of file
+        return float(raw) * mult
+
+
+# slot 描述子：get_stat / add_stat 依編號直接讀寫
+_CUR = tuple(Character.__dict__[s] for s in STATS)
+_MAX = tuple(Character.__dict__[s] for s in MAX_STATS)
@@ -6,7 +6,7 @@ from battle.ai_controller import AIController
 from battle.team_factory import TeamFactory
 from battle.ui_sync import HealthBarSync
 from save.save_manager import SaveManager
-from battle.event_manager import event_manager, EventType
+from battle.event_manager import EventType
 
 
 def main():
@@ -34,7 +34,7 @@ def main():
         ch.controller = enemy_ai
 
     # ===== 5) UI 與劇情層 =====
-    ui = BattleUI(allies, enemies, player_controller)
+    ui = BattleUI(allies, enemies, player_controller, events=bm.events)
     ui.adapter = StoryUIAdapter(ui)
 
     def build_for_node(node, node_id=None):
@@ -75,12 +75,12 @@ def main():
         sm.begin()
 
     # ===== 8) UI 同步：血條與護盾 =====
-    ui._hp_sync = HealthBarSync(ui, allies + enemies)
+    ui._hp_sync = HealthBarSync(ui, allies + enemies, events=bm.events)
 
     # ===== 9) 自動存檔機制=====
     def auto_save(ev, ctx):
         SaveManager.save_game(allies, story_node_id=getattr(sm, "curr", None))
-    event_manager.subscribe(EventType.TURN_END, auto_save, priority=-999, owner="AUTO_SAVE")
+    bm.events.subscribe(EventType.TURN_END, auto_save, priority=-999, owner="AUTO_SAVE")
 
     # ===== 10) 啟動 Tk 主迴圈 =====
     ui.mainloop()
@@ -2,6 +2,7 @@ import json, os
 from character.character import Character
 from battle.skill_library import SkillLibrary
 from character.jobs_library import JobLibrary
+from battle.battle_log import log, INFO, WARNING, ERROR
 
 SAVE_DIR  = "save"
 SAVE_FILE = os.path.join(SAVE_DIR, "player_data.json")
@@ -41,13 +42,13 @@ class SaveManager:
         with open(SAVE_FILE, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
-        print(f"💾 存檔完成 → {SAVE_FILE}")
+        log(INFO, "💾 存檔完成 → {}", SAVE_FILE)
 
     @staticmethod
     def load_game():
         """讀取角色與劇情進度"""
         if not os.path.exists(SAVE_FILE):
-            print("⚠️ 找不到存檔，建立新資料")
+            log(WARNING, "⚠️ 找不到存檔，建立新資料")
             return None, None
 
         JobLibrary.init("jobs.json")
@@ -83,14 +84,14 @@ class SaveManager:
                 sk.cd        = int(info.get("cd",        sk.cd))
                 sk.cdtime    = int(info.get("cdtime",    0))
             chars.append(ch)
-        print(f"✅ 成功載入存檔，劇情節點：{story_node}")
+        log(INFO, "✅ 成功載入存檔，劇情節點：{}", story_node)
         return chars, story_node
 
     @staticmethod
     def update_story_node(node_id):
         """更新劇情節點"""
         if not os.path.exists(SAVE_FILE):
-            print("⚠️ 無存檔可更新，忽略")
+            log(WARNING, "⚠️ 無存檔可更新，忽略")
             return
         try:
             with open(SAVE_FILE, "r", encoding="utf-8") as f:
@@ -98,6 +99,6 @@ class SaveManager:
             data["story_node"] = node_id
             with open(SAVE_FILE, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"📝 劇情節點更新 → {node_id}")
+            log(INFO, "📝 劇情節點更新 → {}", node_id)
         except Exception as e:
-            print("❌ 更新劇情節點失敗：", e)
+            log(ERROR, "❌ 更新劇情節點失敗： {}", e)
@@ -1,7 +1,8 @@
 # story/story_manager.py
-import json, threading, traceback
-from battle.event_manager import event_manager, EventType
+import json, traceback
+from battle.event_manager import EventType
 from battle.battle_log import set_log_sink
+from battle.battle_loop import submit
 
 class StoryManager:
     def __init__(self, ui, battle_manager, build_teams_fn):
@@ -16,10 +17,12 @@ class StoryManager:
         self.nodes = {}
         self.curr = None
         self.on_battle_end_next = None
-        self._battle_thread = None
+        self._battle_task = None  # 目前戰鬥（battle_loop.submit 回傳的 future）
         self.teams = []
+        self.events = battle_manager.events  #與 BattleManager 共用同一條戰鬥匯流排
+        self.ui.events = self.events
         # 讓戰鬥與劇情輸出都寫到 UI Log
-        set_log_sink(lambda msg: self.ui.call_on_ui(self.ui.append_log, msg))
+        set_log_sink(self.ui.post_log)
 
     def load(self, path="story/story.json"):
         with open(path, "r", encoding="utf-8") as f:
@@ -94,31 +97,17 @@ class StoryManager:
             
         # --- ✨ 修改：動態建立 AI 控制器 ---
         
-        # 1. 導入 AIController 和 Feature Enum
-        # (我們假設 ai_controller.py 在 battle/ 目錄下，且 Feature 在那裡定義)
-        try:
-            from battle.ai_controller import AIController, Feature
-        except ImportError:
-            print("❌ 無法導入 AIController 或 Feature！")
-            from battle.ai_controller import AIController
-            Feature = None # 設置一個預設值
+        # 1. 導入 AIController（設定名稱直接對應 ai_profiles.json，不分大小寫）
+        from battle.ai_controller import AIController
 
         # 2. 為本場戰鬥建立一個列表，儲存所有 AI 實例，以便稍後清理
         self._current_enemy_controllers = []
 
         for ch in enemies:
-            feature_str = getattr(ch, "ai_feature_str", "DPS").upper()
-
-            feature_enum = None
-            if Feature:
-                try:
-                    feature_enum = Feature[feature_str]
-                except KeyError:
-                    print(f"⚠️ 未知的 AI Feature '{feature_str}' (來自 {ch.name})，將使用預設 AI。")
-                    feature_enum = Feature.DPS # 預設為 DPS
-            
-            # 5. 建立一個 *新的* AIController 實例並傳入 feature
-            ai_instance = AIController(feature=feature_enum)
+            feature_str = getattr(ch, "ai_feature_str", "DPS")
+
+            # 5. 建立一個 *新的* AIController 實例並傳入設定名稱（BOSS 為搜尋型 AI，GUI 下加牆鐘安全上限）
+            ai_instance = AIController(profile=feature_str, realtime=True)
             ch.controller = ai_instance
             
             # 6. 將此實例儲存起來以便清理
@@ -130,19 +119,19 @@ class StoryManager:
             
             # --- 清理所有 AI 實例的訂閱 ---
             for ai in getattr(self, "_current_enemy_controllers", []):
-                event_manager.unsubscribe_owner(ai)
+                self.events.unsubscribe_owner(ai)
             self._current_enemy_controllers = []
             
             #丟回 UI 執行緒
             if next_id:
                 self.ui.call_on_ui(self.goto, next_id)
                 
-        def run_battle():
+        async def run_battle():
             try:
-                self.bm.battle(allies, enemies)
+                await self.bm.battle_async(allies, enemies)
             except Exception:
                 err = traceback.format_exc()
-                self.ui.call_on_ui(self.ui.append_log, "[Battle thread error]\n" + err)
+                self.ui.post_log("[Battle task error]\n" + err)
             finally:
                 a_alive = any(not c.is_dead() for c in allies)
                 e_alive = any(not c.is_dead() for c in enemies)
@@ -152,19 +141,18 @@ class StoryManager:
                 self.award_after_battle(allies, enemies, node, win)
 
                 _finish(next_id)
-                self._battle_thread = None
 
 
-        # 若舊戰鬥 thread 還在，改用輪詢，
-        def _poll_and_start():
-            if getattr(self, "_battle_thread", None) and self._battle_thread.is_alive():
-                self.ui.call_on_ui(self.ui.append_log, "等待上一場戰鬥釋放資源…")
-                self.ui.after(50, _poll_and_start)
-            else:
-                self._battle_thread = threading.Thread(target=run_battle, daemon=True)
-                self._battle_thread.start()
+        # 戰鬥是共用事件迴圈上的 task；舊戰鬥還沒收尾就等它完成後再開始（不輪詢）
+        def _start():
+            self._battle_task = submit(run_battle())
 
-        _poll_and_start()
+        prev = self._battle_task
+        if prev is not None and not prev.done():
+            self.ui.post_log("等待上一場戰鬥釋放資源…")
+            prev.add_done_callback(lambda _f: self.ui.call_on_ui(_start))
+        else:
+            _start()
 
 
     def bind_triggers(self):
@@ -177,7 +165,7 @@ class StoryManager:
                     tgt._lowhp_cutin = True
             except Exception:
                 pass
-        event_manager.subscribe(EventType.AFTER_TAKE_DAMAGE, on_after_take_damage, priority=10, owner=self)
+        self.events.subscribe(EventType.AFTER_TAKE_DAMAGE, on_after_take_damage, priority=10, owner=self)
     #戰鬥回報
     def _reward_after_battle(self, allies, enemies, node):
         reward_cfg = node.get("reward") or {}
@@ -200,9 +188,8 @@ class StoryManager:
             before_lv = ch.lv
             ch.obtained_exp(exp_each)
             after_lv = ch.lv
-            self.ui.call_on_ui(self.ui.append_log,
-                            f"🎉 {ch.name} 獲得 {exp_each} EXP（Lv.{before_lv} → Lv.{after_lv}）")
+            self.ui.post_log(f"🎉 {ch.name} 獲得 {exp_each} EXP（Lv.{before_lv} → Lv.{after_lv}）")
         from save.save_manager import SaveManager
         SaveManager.save_game(allies, story_node_id=self.curr)
-        self.ui.call_on_ui(self.ui.append_log, "💾 獎勵已儲存至存檔")
+        self.ui.post_log("💾 獎勵已儲存至存檔")
 
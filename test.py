@@ -7,7 +7,7 @@ from battle.team_factory import TeamFactory
 from battle.battle_manager import BattleManager
 from battle.effect_registry import EffectRegistry
 from battle.ai_controller import AIController
-from battle.event_manager import event_manager, EventType, EventContext
+from battle.event_manager import EventManager, EventType, EventContext
 
 # ============================================================
 # 角色貢獻統計
@@ -66,7 +66,7 @@ class RecordHooks:
 # ============================================================
 # 單場 4v4 對戰
 # ============================================================
-def fight_4v4(job_a: str, job_b: str, battle_id: int):
+def fight_4v4(job_a: str, job_b: str, battle_id: int, seed=None):
     TeamFactory.init()
     EffectRegistry.init()
     JobLibrary.init("jobs.json")
@@ -86,21 +86,21 @@ def fight_4v4(job_a: str, job_b: str, battle_id: int):
     # 收集貢獻
     contrib_map = {}
 
-    recorder = RecordHooks(contrib_map)
-    event_manager.subscribe(EventType.AFTER_ATTACK, recorder.after_attack, owner=battle_id)
-    event_manager.subscribe(EventType.APPLY_BUFF, recorder.apply_buff, owner=battle_id)
-    event_manager.subscribe(EventType.SKILL_RESOLVE, recorder.skill_resolve, owner=battle_id)
+    # 每場戰鬥自帶匯流排
+    bm = BattleManager(controller=ai_a, events=EventManager(), seed=seed)
 
+    recorder = RecordHooks(contrib_map)
+    bm.events.subscribe(EventType.AFTER_ATTACK, recorder.after_attack, owner=battle_id)
+    bm.events.subscribe(EventType.APPLY_BUFF, recorder.apply_buff, owner=battle_id)
+    bm.events.subscribe(EventType.SKILL_RESOLVE, recorder.skill_resolve, owner=battle_id)
 
     # 執行戰鬥
-    bm = BattleManager(controller=ai_a)
     bm.battle(team_a, team_b)
 
     # 誰贏？
     a_alive = any(not c.is_dead() for c in team_a)
     b_alive = any(not c.is_dead() for c in team_b)
 
-    event_manager.unsubscribe_owner(battle_id)
     return contrib_map, a_alive, b_alive
 
 # ============================================================
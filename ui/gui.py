@@ -1,3 +1,4 @@
+import asyncio
 import threading
 import traceback
 import tkinter as tk
@@ -5,14 +6,20 @@ from tkinter import ttk
 
 from battle.ui_sync import HealthBarSync
 from battle.battle_log import BattleLog, set_log_sink
-from battle.event_manager import event_manager, EventType
+from battle.event_manager import EventType
 from battle.battle_manager import BattleManager
+from battle.battle_loop import resolve
 from battle.effect_registry import EffectRegistry
 from battle.skill_library import SkillLibrary
 from character.jobs_library import JobLibrary
 from character.character import Character
+from ui.thumbnail import make_thumbnail
 import os
-import math
+import base64
+import hashlib
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 # -----------------------------
@@ -66,16 +73,43 @@ class ToolTip:
         if tw:
             tw.destroy()
 
+def buff_color(buff):
+    name = buff.effect.name
+
+    if name in ("ADDPATK", "ADDMATK", "ADDPDEF", "ADDMDEF",
+                "ADDSHIELD", "ADDCRI", "ADDHIT"):
+        return "#4ec9b0"   # 增益：綠色
+
+    if name in ("DOT", "MARK", "STUN", "CONSUME_MARK", "ADDMISS"):
+        return "#d16969"   # 減益 / 控制：紅色
+
+    if name in ("INVINCIBLE", "TAUNT"):
+        return "#c586c0"   # 特殊：紫色
+
+    return "white"
+
 # -----------------------------
 # 腳色頭像
 # -----------------------------
 class AvatarProvider:
-
-    def __init__(self, base_dir="assets/avatars", size=(48, 48), keep_aspect=True):
+    """
+    頭像載入：解碼與縮圖在背景執行緒完成（沒有 Pillow 時用 ui/thumbnail 的標準函式庫解碼），
+    並把縮好的 PNG 存到磁碟快取（以來源路徑、mtime 與尺寸為 key；同一張圖的舊縮圖寫入時刪除）。
+    尚未就緒時先回傳佔位圖，完成後在 Tk 執行緒載入縮好的小圖並呼叫 on_ready。
+    """
+    POLL_MS = 30
+
+    def __init__(self, base_dir="assets/avatars", size=(48, 48), keep_aspect=True, cache_dir=None):
         self.base_dir = base_dir
         self.size = size            # (w, h)
         self.keep_aspect = keep_aspect
-        self._cache = {}            # key: (name, job, size) -> PhotoImage
+        self.cache_dir = cache_dir or os.path.join(base_dir, ".thumbs")
+        self._cache = {}            # key: (name, job, size) -> PhotoImage（None = 沒有頭像）
+        self._waiters = {}          # key -> [on_ready, ...]（背景處理中）
+        self._done = queue.SimpleQueue()  # 背景 → Tk：(key, 縮圖路徑 / 縮圖 PNG bytes / None)
+        self._pool = None
+        self._placeholder = None
+        self._polling = False
 
     def _find_path(self, char):
         name = getattr(char, "name", None)
@@ -90,43 +124,114 @@ class AvatarProvider:
                 return p
         return None
 
-    def load(self, char, tk_root=None):
+    def load(self, char, tk_root=None, on_ready=None):
+        """
+        已載入 → 回傳 PhotoImage；沒有頭像 → None；
+        處理中 → 回傳佔位圖，完成後呼叫 on_ready(photo)。
+        """
         key = (getattr(char, "name", None), getattr(char, "job", None), self.size)
         if key in self._cache:
             return self._cache[key]
 
-        path = self._find_path(char)
-        if not path:
-            return None
-
+        waiters = self._waiters.get(key)
+        if waiters is None:
+            waiters = self._waiters[key] = []
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="avatar")
+            self._pool.submit(self._decode, key, char)
+        if on_ready is not None and on_ready not in waiters:
+            waiters.append(on_ready)
+        self._start_polling(tk_root)
+        return self._get_placeholder(tk_root)
+
+    # --- 背景執行緒：只做檔案 I/O 與解碼縮圖，不碰 Tk ---
+    def _thumb_path(self, path):
+        """回傳 (縮圖路徑, 同一張圖舊縮圖的檔名前綴)"""
+        st = os.stat(path)
         w, h = self.size
-        photo = None
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+        mode = "fit" if self.keep_aspect else "fill"
+        prefix = f"{digest}_{w}x{h}_{mode}_"
+        return os.path.join(self.cache_dir, f"{prefix}{st.st_mtime_ns}.png"), prefix
 
-        # 1)Pillow
+    def _store(self, thumb, prefix, png):
+        """寫入快取並刪掉同一張圖的舊縮圖；快取目錄不可寫時回傳 PNG bytes 交給 Tk 直接載入"""
         try:
-            from PIL import Image, ImageTk, ImageOps  # type: ignore
-            img = Image.open(path).convert("RGBA")
-            if self.keep_aspect:
-                # thumbnail 會維持比例，把最長邊縮到指定框內
-                img.thumbnail((w, h), Image.LANCZOS)
-                
-            else:
-                img = img.resize((w, h), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(img, master=tk_root)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{thumb}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, thumb)
+        except OSError:
+            return png
+        name = os.path.basename(thumb)
+        for fn in os.listdir(self.cache_dir):
+            if fn.startswith(prefix) and fn.endswith(".png") and fn != name:
+                try:
+                    os.remove(os.path.join(self.cache_dir, fn))
+                except OSError:
+                    pass
+        return thumb
+
+    def _decode(self, key, char):
+        path = self._find_path(char)
+        result = None
+        if path:
+            try:
+                thumb, prefix = self._thumb_path(path)
+                if os.path.exists(thumb):
+                    result = thumb
+                else:
+                    png = make_thumbnail(path, self.size, self.keep_aspect)
+                    if png is not None:
+                        result = self._store(thumb, prefix, png)
+            except Exception:
+                result = None  # 讀不到 / 不支援的格式：當作沒有頭像
+        self._done.put((key, result))
+
+    # --- Tk 執行緒 ---
+    def _get_placeholder(self, tk_root):
+        if self._placeholder is None:
+            w, h = self.size
+            self._placeholder = tk.PhotoImage(width=w, height=h, master=tk_root)
+        return self._placeholder
+
+    def _start_polling(self, tk_root):
+        if self._polling or tk_root is None:
+            return
+        self._polling = True
+        self._root = tk_root
+        tk_root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                key, result = self._done.get_nowait()
+            except queue.Empty:
+                break
+            photo = self._make_photo(result)
+            self._cache[key] = photo
+            for cb in self._waiters.pop(key, ()):
+                try:
+                    cb(photo)
+                except Exception:
+                    pass
+        if self._waiters:
+            self._root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
 
+    def _make_photo(self, result):
+        if result is None:
+            return None
+        try:
+            if isinstance(result, bytes):
+                # 快取寫不進去：背景已縮好的小 PNG 直接從記憶體載入
+                return tk.PhotoImage(data=base64.b64encode(result), master=self._root)
+            # 已縮好的快取 PNG：Tk 直接讀，幾乎沒有成本
+            return tk.PhotoImage(file=result, master=self._root)
         except Exception:
-            # 2) 沒 Pillow 時，至少用 subsample 強制縮小到不超過 (w, h)
-            import tkinter as tk
-            raw = tk.PhotoImage(file=path, master=tk_root)
-            rw, rh = raw.width(), raw.height()
-            # 計算整數縮小倍率（越大縮得越多），確保不超過目標框
-            fx = max(1, math.ceil(rw / w)) if w else 1
-            fy = max(1, math.ceil(rh / h)) if h else 1
-            factor = max(fx, fy)
-            photo = raw.subsample(factor, factor)
-
-        self._cache[key] = photo
-        return photo
+            return None
 # -----------------------------
 # GUI 控制器：給 BattleManager 呼叫
 # -----------------------------
@@ -160,6 +265,18 @@ class GUIController:
             while self._target_choice is None:
                 self._lock.wait()
             return self._target_choice
+    # BattleManager.turn_async 呼叫：回傳 awaitable，按鈕回呼直接完成 future（不佔用執行緒等待）
+    async def select_skill_async(self, actor):
+        fut = asyncio.get_running_loop().create_future()
+        self.ui.call_on_ui(self.ui.show_skill_choices, actor, lambda idx: resolve(fut, idx))
+        return await fut
+
+    async def select_target_async(self, candidates, prompt="選擇目標"):
+        living = [c for c in candidates if not c.is_dead()]
+        fut = asyncio.get_running_loop().create_future()
+        self.ui.call_on_ui(self.ui.show_target_choices, prompt, living, lambda t: resolve(fut, t))
+        return await fut
+
     #呼叫 choose_target；
     def choose_target(self, candidates):
         return self.select_target(candidates)
@@ -218,6 +335,8 @@ class CharPanel(ttk.Frame):
         # ★ Buff 區塊：放在血量下方一排
         self.frm_buffs = tk.Frame(self, bg="#1a1a1a")
         self.frm_buffs.grid(row=3, column=1, sticky="w", pady=2)
+        # 標籤池：[label, tooltip, 目前顯示的 (文字, 顏色), 是否顯示]
+        self._buff_slots = []
         
         self.columnconfigure(1, weight=1)
         self.refresh()
@@ -226,7 +345,7 @@ class CharPanel(ttk.Frame):
         if not self._avatar_provider:
             return
         tk_root = self.winfo_toplevel()
-        photo = self._avatar_provider.load(self.char, tk_root)
+        photo = self._avatar_provider.load(self.char, tk_root, on_ready=self._on_avatar_ready)
         if photo:
             self._avatar_photo = photo
             self.lbl_avatar.configure(image=self._avatar_photo)
@@ -235,6 +354,13 @@ class CharPanel(ttk.Frame):
             self.lbl_avatar.configure(image="")
             self._avatar_photo = None
 
+    def _on_avatar_ready(self, photo):
+        # 背景解碼完成（Tk 執行緒）；面板可能已在換隊時銷毀
+        if not self.winfo_exists():
+            return
+        self._avatar_photo = photo
+        self.lbl_avatar.configure(image=photo or "")
+
     def _draw_hp(self):
         c = self.char
         max_hp = max(1, int(getattr(c, "max_hp", 1)))
@@ -289,15 +415,46 @@ class CharPanel(ttk.Frame):
         self._draw_hp()
         self._draw_shield()
 
+    def update_buffs(self, buffs):
+        """就地更新 Buff 標籤：只在數量變多時建立新標籤，變少時隱藏多餘的"""
+        for i, b in enumerate(buffs):
+            if i == len(self._buff_slots):
+                lbl = tk.Label(self.frm_buffs, bg="#1a1a1a", font=("微軟正黑體", 9), padx=4)
+                self._buff_slots.append([lbl, ToolTip(lbl, ""), None, False])
+            slot = self._buff_slots[i]
+            lbl, tip = slot[0], slot[1]
+            look = (f"{b.name}({b.duration}T)", buff_color(b))
+            if look != slot[2]:
+                lbl.configure(text=look[0], fg=look[1])
+                slot[2] = look
+            # Tooltip 只綁一次，滑鼠移入時才讀取最新文字
+            tip.text = (f"名稱：{b.name}\n"
+                        f"描述：{b.desc}\n"
+                        f"效果：{b.effect.name}\n"
+                        f"剩餘回合：{b.duration}")
+            if not slot[3]:
+                lbl.pack(side="left", padx=3)
+                slot[3] = True
+        for slot in self._buff_slots[len(buffs):]:
+            if slot[3]:
+                slot[1]._hide()
+                slot[0].pack_forget()
+                slot[3] = False
+
     def update_health_from_char(self): self._draw_hp(); self.hp_var.set(f"HP {int(self.char.hp)}/{int(self.char.max_hp)}  盾 {int(getattr(self.char,'shield',0))}")
     def update_shield_from_char(self): self._draw_shield(); self.hp_var.set(f"HP {int(self.char.hp)}/{int(self.char.max_hp)}  盾 {int(getattr(self.char,'shield',0))}")
 
 # -----------------------------
 # 主視窗
 # -----------------------------
+LOG_TICK_MS = 33   # 戰鬥記錄的刷新間隔
+LOG_BATCH = 200    # 每次刷新最多寫入的行數（避免失控的戰鬥卡住 Tk）
+
+
 class BattleUI(tk.Tk):
-    def __init__(self, allies, enemies, controller: GUIController):
+    def __init__(self, allies, enemies, controller: GUIController, events=None):
         super().__init__()
+        self.events = events  #戰鬥匯流排（給 HealthBarSync）
         self.title("回合制戰鬥（GUI）")
         self.geometry("820x600")
         self.controller = controller
@@ -345,8 +502,10 @@ class BattleUI(tk.Tk):
         sb.pack(side="right", fill="y")
         self.txt_log["yscrollcommand"] = sb.set
 
-        # 把 BattleLog 導到 UI
-        set_log_sink(lambda msg: self.call_on_ui(self.append_log, msg))
+        # 把 BattleLog 導到 UI：戰鬥執行緒只把字串放進佇列，由主執行緒定時整批寫入
+        self._log_queue = deque()
+        set_log_sink(self.post_log)
+        self._log_tick()
         # 立即刷新一次
         self.refresh_panels()
         # ui/gui.py -> class BattleUI(...):
@@ -396,61 +555,11 @@ class BattleUI(tk.Tk):
         if not panel:
             return
 
-        frm = panel.frm_buffs
-
-        # 清掉舊 buff 標籤
-        for w in frm.winfo_children():
-            w.destroy()
-
-        # 若沒 buff → 顯示空
-        if not getattr(ch, "buffs", None):
-            return
-
-        # 依序顯示每個 Buff
-        for b in ch.buffs:
+        # 差異更新：沿用面板上的標籤池，不再整排銷毀重建
+        panel.update_buffs(list(getattr(ch, "buffs", None) or ()))
+        self._buff_labels[ch] = [slot[0] for slot in panel._buff_slots if slot[3]]
 
-            # 顯示在 Label 上的短字
-            txt = f"{b.name}({b.duration}T)"
-
-            # 顏色分類
-            color = self._buff_color(b)
-
-            lbl = tk.Label(
-                frm,
-                text=txt,
-                fg=color,
-                bg="#1a1a1a",
-                font=("微軟正黑體", 9),
-                padx=4
-            )
-            lbl.pack(side="left", padx=3)
-
-            # Tooltip 顯示更完整資訊
-            detail = (
-                f"名稱：{b.name}\n"
-                f"描述：{b.desc}\n"
-                f"效果：{b.effect.name}\n"
-                f"剩餘回合：{b.duration}"
-            )
-            ToolTip(lbl, detail)
-
-        # 更新紀錄
-        self._buff_labels[ch] = frm.winfo_children()
-
-    def _buff_color(self, buff):
-        name = buff.effect.name
-
-        if name in ("ADDPATK", "ADDMATK", "ADDPDEF", "ADDMDEF",
-                    "ADDSHIELD", "ADDCRI", "ADDHIT"):
-            return "#4ec9b0"   # 增益：綠色
-
-        if name in ("DOT", "MARK", "STUN", "CONSUME_MARK", "ADDMISS"):
-            return "#d16969"   # 減益 / 控制：紅色
-
-        if name in ("INVINCIBLE", "TAUNT"):
-            return "#c586c0"   # 特殊：紫色
-
-        return "white"
+    _buff_color = staticmethod(buff_color)
 
     def call_on_ui(self, fn, *args, **kwargs):
         # 把 UI 操作排回 Tk 主執行緒
@@ -484,8 +593,24 @@ class BattleUI(tk.Tk):
         self.refresh_panels()
 
 
-    def append_log(self, msg: str):
-        self.txt_log.insert("end", msg + "\n")
+    def post_log(self, msg: str):
+        # 任何執行緒都可呼叫（deque.append 為執行緒安全）
+        self._log_queue.append(msg)
+
+    # 舊呼叫點（call_on_ui(append_log, ...)）一樣走佇列，順序與戰鬥紀錄一致
+    append_log = post_log
+
+    def _log_tick(self):
+        self._drain_log()
+        # 還有積壓就盡快再排一次，但每次都先讓 Tk 處理其他事件
+        self.after(1 if self._log_queue else LOG_TICK_MS, self._log_tick)
+
+    def _drain_log(self):
+        q = self._log_queue
+        if not q:
+            return
+        lines = [q.popleft() for _ in range(min(len(q), LOG_BATCH))]
+        self.txt_log.insert("end", "\n".join(lines) + "\n")
         self.txt_log.see("end")
 
     def clear_choices(self):
@@ -554,7 +679,7 @@ class BattleUI(tk.Tk):
         for p in self.enemy_panels:
             p.pack(anchor="w", fill="x", padx=8, pady=4)
         self._rebuild_panel_map()              #重建角色→面板映射
-        self._hp_sync = HealthBarSync(self, self.allies + self.enemies)
+        self._hp_sync = HealthBarSync(self, self.allies + self.enemies, events=self.events)
 
         # 4) 刷新
         self.refresh_panels()
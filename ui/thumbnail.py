@@ -0,0 +1,147 @@
+# ui/thumbnail.py
+# 頭像縮圖：在背景執行緒把原圖縮成小 PNG（bytes），Tk 執行緒只需載入縮好的小圖。
+#
+# - 有 Pillow 時用 Pillow（LANCZOS）
+# - 沒有 Pillow 時用標準函式庫解 PNG（zlib + 逐列反濾波），再以最近鄰取樣縮小；
+#   支援 8-bit、非交錯的灰階 / RGB / 調色盤 / 灰階+透明 / RGBA，其餘格式回傳 None
+import struct
+import zlib
+from io import BytesIO
+
+_SIG = b"\x89PNG\r\n\x1a\n"
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # 色彩類型 → 每像素位元組數（8-bit）
+
+
+def make_thumbnail(path, size, keep_aspect=True):
+    """回傳縮好的 PNG bytes；無法解碼時回傳 None"""
+    try:
+        from PIL import Image  # type: ignore
+    except ImportError:
+        return _png_thumbnail(path, size, keep_aspect)
+    w, h = size
+    img = Image.open(path).convert("RGBA")
+    if keep_aspect:
+        # thumbnail 會維持比例，把最長邊縮到指定框內
+        img.thumbnail((w, h), Image.LANCZOS)
+    else:
+        img = img.resize((w, h), Image.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _target_size(rw, rh, size, keep_aspect):
+    w, h = size
+    if not keep_aspect:
+        return w, h
+    scale = min(w / rw, h / rh, 1.0)
+    return max(1, round(rw * scale)), max(1, round(rh * scale))
+
+
+# ---------- 標準函式庫版 ----------
+def _chunks(data):
+    pos = len(_SIG)
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def _unfilter(raw, width, height, bpp):
+    """逐列還原 PNG 濾波；回傳各列像素 bytes 的 list"""
+    stride = width * bpp
+    rows = []
+    prev = bytes(stride)
+    pos = 0
+    for _ in range(height):
+        ftype = raw[pos]
+        line = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += 1 + stride
+        if ftype == 1:    # Sub
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 255
+        elif ftype == 2:  # Up
+            line = bytearray([(a + b) & 255 for a, b in zip(line, prev)])
+        elif ftype == 3:  # Average
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + prev[i]) >> 1)) & 255
+        elif ftype == 4:  # Paeth
+            for i in range(stride):
+                if i >= bpp:
+                    a, c = line[i - bpp], prev[i - bpp]
+                else:
+                    a = c = 0
+                b = prev[i]
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    pred = a
+                elif pb <= pc:
+                    pred = b
+                else:
+                    pred = c
+                line[i] = (line[i] + pred) & 255
+        rows.append(line)
+        prev = line
+    return rows
+
+
+def _png_thumbnail(path, size, keep_aspect):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(_SIG):
+        return None
+    ihdr, idat, palette, trns = None, [], None, None
+    for kind, body in _chunks(data):
+        if kind == b"IHDR":
+            ihdr = struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"PLTE":
+            palette = body
+        elif kind == b"tRNS":
+            trns = body
+        elif kind == b"IEND":
+            break
+    if ihdr is None:
+        return None
+    rw, rh, depth, ctype, _, _, interlace = ihdr
+    bpp = _CHANNELS.get(ctype)
+    if depth != 8 or interlace or bpp is None or (ctype == 3 and not palette):
+        return None
+    rows = _unfilter(zlib.decompress(b"".join(idat)), rw, rh, bpp)
+
+    tw, th = _target_size(rw, rh, size, keep_aspect)
+    xs = [min(rw - 1, (x * rw + rw // 2) // tw) for x in range(tw)]
+    out = bytearray()
+    for y in range(th):
+        line = rows[min(rh - 1, (y * rh + rh // 2) // th)]
+        out.append(0)  # 濾波類型 None
+        for x in xs:
+            i = x * bpp
+            if ctype == 6:
+                out += line[i:i + 4]
+            elif ctype == 2:
+                out += line[i:i + 3]
+                out.append(255)
+            elif ctype == 0:
+                g = line[i]
+                out += bytes((g, g, g, 255))
+            elif ctype == 4:
+                g = line[i]
+                out += bytes((g, g, g, line[i + 1]))
+            else:  # 調色盤
+                k = line[i]
+                out += palette[3 * k:3 * k + 3]
+                out.append(trns[k] if trns and k < len(trns) else 255)
+    return _encode_png(tw, th, bytes(out))
+
+
+def _encode_png(width, height, rows):
+    """rows：已帶濾波位元組的 RGBA 列資料"""
+    def chunk(kind, body):
+        return (struct.pack(">I", len(body)) + kind + body
+                + struct.pack(">I", zlib.crc32(kind + body) & 0xffffffff))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return _SIG + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")